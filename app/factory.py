@@ -1,13 +1,36 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from config.base_config import BaseConfig
 from pipelines.base import BasePipeline
+from services.loop_monitor import loop_monitor
+from utils.http import http_pool
+from utils.logging import setup_logging, shutdown_logging
 
 
 class AppFactory:
     @staticmethod
     def create_app(config: BaseConfig, pipeline: BasePipeline) -> FastAPI:
-        app = FastAPI()
+        setup_logging(config.logging_config)
+
+        @asynccontextmanager
+        async def lifespan(app: FastAPI):
+            # Every HTTP provider borrows its connections from the process-wide pool
+            http_pool.configure(config.http_config)
+            if config.http_config.prewarm:
+                await http_pool.prewarm()
+            await pipeline.startup()
+            # Every call shares this loop, watch for anything that blocks it
+            loop_monitor.configure(config.monitor_config.loop_lag_interval, config.monitor_config.slow_callback_ms)
+            loop_monitor.start()
+            yield
+            await loop_monitor.stop()
+            # Provider clients are shared by every call, close them once on shutdown
+            await pipeline.cleanup()
+            await http_pool.aclose()
+            shutdown_logging()
+
+        app = FastAPI(lifespan=lifespan)
 
         # Add CORS middleware
         app.add_middleware(
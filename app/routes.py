@@ -1,6 +1,13 @@
-from fastapi import FastAPI, WebSocket, Request
-from fastapi.responses import HTMLResponse
+import os
+import secrets
+from fastapi import FastAPI, HTTPException, WebSocket, Request
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
 from twilio.twiml.voice_response import VoiceResponse, Connect
+from services import admission
+from services.loop_monitor import loop_monitor
+from services.metrics import metrics
+from services.profiler import stack_sampler
+from utils.logging import log_stats
 
 def register_routes(app: FastAPI):
     @app.websocket("/media-stream")
@@ -14,4 +21,61 @@ def register_routes(app: FastAPI):
         connect = Connect()
         connect.stream(url=f'wss://{host}/media-stream')
         response.append(connect)
-        return HTMLResponse(content=str(response), media_type="application/xml")
\ No newline at end of file
+        return HTMLResponse(content=str(response), media_type="application/xml")
+
+    @app.get("/ready")
+    async def handle_ready():
+        """One worker's answer, whichever the kernel handed this request to
+
+        With several workers on one socket this says nothing about the worker that takes
+        the next call; a full worker refuses calls itself, see BasePipeline.refuse_if_full.
+        """
+        active = app.state.pipeline.session_factory.active_count
+        limit = app.state.config.pipeline_config.max_sessions
+        ready = not limit or active < limit
+        return JSONResponse(
+            {"ready": ready, "worker": os.getenv("WORKER_ID", "0"), "active_sessions": active, "max_sessions": limit},
+            status_code=200 if ready else 503
+        )
+
+    @app.get("/metrics")
+    async def handle_metrics():
+        active = app.state.pipeline.session_factory.active_count
+        logs = log_stats()
+        content = metrics.render() + loop_monitor.render() + admission.render() + (
+            "# HELP voice_active_sessions Calls currently connected.\n"
+            "# TYPE voice_active_sessions gauge\n"
+            f"voice_active_sessions {active}\n"
+            "# HELP voice_log_records_dropped_total Log records dropped because the log queue was full.\n"
+            "# TYPE voice_log_records_dropped_total counter\n"
+            f"voice_log_records_dropped_total {logs['dropped']}\n"
+        )
+        return PlainTextResponse(content, media_type="text/plain; version=0.0.4")
+
+    def require_admin(request: Request):
+        token = app.state.config.monitor_config.admin_token
+        if not token:
+            raise HTTPException(status_code=404)
+        supplied = request.headers.get("authorization", "").removeprefix("Bearer ")
+        if not secrets.compare_digest(supplied.encode(), token.encode()):
+            raise HTTPException(status_code=401, headers={"WWW-Authenticate": "Bearer"})
+
+    @app.get("/admin/loop")
+    async def handle_loop_stats(request: Request):
+        require_admin(request)
+        return JSONResponse(loop_monitor.stats())
+
+    @app.get("/admin/profile")
+    async def handle_profile(request: Request, seconds: float = 10.0, interval_ms: float = 5.0, loop_only: bool = False):
+        """Folded stacks for flamegraph.pl or speedscope, sampled while calls keep running"""
+        require_admin(request)
+        max_seconds = app.state.config.monitor_config.profile_max_seconds
+        if not 0 < seconds <= max_seconds or interval_ms < 1:
+            raise HTTPException(status_code=400, detail=f"seconds must be in (0, {max_seconds}], interval_ms >= 1")
+        if stack_sampler.running:
+            raise HTTPException(status_code=409, detail="A profile is already running")
+        try:
+            folded = await stack_sampler.profile(seconds, interval_ms / 1000, loop_only)
+        except RuntimeError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        return PlainTextResponse(folded)
\ No newline at end of file
@@ -0,0 +1,111 @@
+"""Run the app in several worker processes that share one listening socket
+
+    python main.py --workers 4
+
+Each worker is a separate interpreter with its own event loop, providers and
+connection pools, built by calling the app factory. A Twilio media stream is one
+websocket, so whichever worker accepts it serves the whole call and no call state
+crosses workers. Caches that are worth sharing go to files on tmpfs that every
+worker maps, see utils/store.MmapSegmentStore.
+"""
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import tempfile
+import threading
+import time
+from typing import Dict
+
+import uvicorn
+
+from config.base_config import BaseConfig
+from utils.logging import setup_logging, shutdown_logging
+
+logger = logging.getLogger(__name__)
+
+SHARED_ROOT = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+
+
+def run_worker(app: str, worker_id: int, sock: socket.socket, log_level: str):
+    os.environ['WORKER_ID'] = str(worker_id)
+    config = uvicorn.Config(app, factory=True, log_level=log_level)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class WorkerSupervisor:
+    """Starts the workers, restarts any that die and stops them all on SIGINT/SIGTERM"""
+
+    def __init__(
+        self,
+        app: str,
+        host: str = "0.0.0.0",
+        port: int = 8000,
+        workers: int = os.cpu_count() or 1,
+        log_level: str = "info",
+        restart_delay: float = 1.0
+    ):
+        self.app = app  # "module:factory", imported and called in each worker
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.log_level = log_level
+        self.restart_delay = restart_delay
+        self.processes: Dict[int, multiprocessing.Process] = {}
+        self.started: Dict[int, float] = {}
+        self.should_exit = threading.Event()
+        self.context = multiprocessing.get_context('spawn')
+
+    def share_caches(self):
+        # Workers inherit these, so a clip synthesized by one is a disk hit for all of them;
+        # each still keeps the clips it plays often in its own memory tier
+        os.environ.setdefault('TTS_CACHE_DIR', os.path.join(SHARED_ROOT, 'voice-tts-cache'))
+        os.environ.setdefault('LLM_CACHE_DIR', os.path.join(SHARED_ROOT, 'voice-llm-cache'))
+
+    def spawn(self, worker_id: int):
+        process = self.context.Process(
+            target=run_worker,
+            args=(self.app, worker_id, self.socket, self.log_level),
+            name=f"worker-{worker_id}"
+        )
+        process.start()
+        self.processes[worker_id] = process
+        self.started[worker_id] = time.monotonic()
+
+    def run(self):
+        setup_logging(BaseConfig().logging_config)
+        config = uvicorn.Config(self.app, host=self.host, port=self.port, factory=True)
+        self.socket = config.bind_socket()
+        self.share_caches()
+
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda *_: self.should_exit.set())
+
+        for worker_id in range(self.workers):
+            self.spawn(worker_id)
+        logger.info("Workers started", extra={'workers': self.workers, 'port': self.port})
+
+        while not self.should_exit.wait(0.5):
+            for worker_id, process in list(self.processes.items()):
+                # Waiting out restart_delay keeps a worker that dies on startup from spinning
+                if process.is_alive() or time.monotonic() - self.started[worker_id] < self.restart_delay:
+                    continue
+                logger.warning("Worker exited, restarting", extra={
+                    'worker_id': worker_id, 'exitcode': process.exitcode
+                })
+                self.spawn(worker_id)
+
+        self.shutdown()
+
+    def shutdown(self, timeout: float = 10.0):
+        for process in self.processes.values():
+            if process.is_alive():
+                process.terminate()  # SIGTERM, uvicorn lets calls wind down
+        deadline = time.monotonic() + timeout
+        for process in self.processes.values():
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.kill()
+        self.socket.close()
+        shutdown_logging()
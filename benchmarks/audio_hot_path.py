@@ -0,0 +1,384 @@
+"""Microbenchmarks for the per-frame and per-utterance audio work in the pipelines
+
+    python -m benchmarks.audio_hot_path --save baseline.json
+    python -m benchmarks.audio_hot_path --compare baseline.json --threshold 0.15
+
+Each benchmark reports nanoseconds per operation, best and median of --repeat
+runs. With --compare the run exits non-zero when any best time is more than
+--threshold slower than the saved one, so it can gate a change. Best-of-N is
+compared because it is the least sensitive to noise from the rest of the machine.
+"""
+import argparse
+import asyncio
+import io
+import json
+import platform
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import orjson
+from pydub import AudioSegment
+from pydub.utils import which
+
+from pipelines.twilio_pipeline import TwilioPipeline
+from providers.tts.base import MULAW_8K
+from services.audio_handler import AudioHandler
+from services.executor import AudioExecutor
+from services.inbound import FrameAggregator
+from services.pacer import AudioPacer
+from services.session import CallSession
+from services.speech_stream import SegmentAudio
+from services.stream_manager import StreamManager
+from services.vad import VoiceActivityDetector
+from utils.audio import decode_media_payload, encode_media_payload, pcm16_to_ulaw, ulaw_to_samples
+
+SEED = 1234
+TTS_CHUNK_BYTES = 4096  # typical streamed HTTP chunk
+
+
+class Benchmark:
+    def __init__(self, name: str, unit: str, setup: Callable[[], Callable[[int], None]], needs: Optional[str] = None):
+        self.name = name
+        self.unit = unit  # what one operation is
+        self.setup = setup  # returns run(n), which performs n operations
+        self.needs = needs
+
+
+BENCHMARKS: List[Benchmark] = []
+
+
+def benchmark(name: str, unit: str, needs: Optional[str] = None):
+    def register(setup):
+        BENCHMARKS.append(Benchmark(name, unit, setup, needs))
+        return setup
+    return register
+
+
+def pcm16(seconds: float, rate: int) -> bytes:
+    # Deterministic speech-like signal, a few harmonics plus noise
+    rng = np.random.default_rng(SEED)
+    t = np.arange(int(seconds * rate)) / rate
+    wave = sum(np.sin(2 * np.pi * f * t) / (i + 1) for i, f in enumerate((150, 300, 450, 900)))
+    wave = wave / np.abs(wave).max() * 12000 + rng.normal(0, 300, t.size)
+    return np.clip(wave, -32768, 32767).astype('<i2').tobytes()
+
+
+def media_event(frame: bytes) -> str:
+    return json.dumps({
+        "event": "media",
+        "sequenceNumber": "42",
+        "media": {"track": "inbound", "chunk": "41", "timestamp": "820", "payload": encode_media_payload(frame)},
+        "streamSid": "MZ18ad3ab5a668481ce02b83e7395059f0"
+    })
+
+
+class NullWebSocket:
+    async def send_text(self, data: str):
+        pass
+
+
+def run_async(make_coro: Callable[[int], object]) -> Callable[[int], None]:
+    loop = asyncio.new_event_loop()
+    return lambda n: loop.run_until_complete(make_coro(n))
+
+
+# Inbound, per 20 ms Twilio frame
+
+ULAW_FRAME = pcm16_to_ulaw(pcm16(0.02, 8000))
+
+
+@benchmark("inbound.json_loads_media_event", "frame")
+def bench_json_loads():
+    message = media_event(ULAW_FRAME)
+
+    def run(n):
+        for _ in range(n):
+            json.loads(message)
+    return run
+
+
+@benchmark("inbound.orjson_loads_media_event", "frame")
+def bench_orjson_loads():
+    # What TwilioPipeline.receive_audio parses with
+    message = media_event(ULAW_FRAME)
+
+    def run(n):
+        for _ in range(n):
+            orjson.loads(message)
+    return run
+
+
+@benchmark("inbound.frame_aggregator_add", "frame")
+def bench_frame_aggregator():
+    # Batching frames for STT, one send per stt_batch_ms
+    aggregator = FrameAggregator()
+
+    def run(n):
+        for _ in range(n):
+            aggregator.add(ULAW_FRAME)
+    return run
+
+
+@benchmark("inbound.base64_decode_payload", "frame")
+def bench_base64_decode():
+    payload = encode_media_payload(ULAW_FRAME)
+
+    def run(n):
+        for _ in range(n):
+            decode_media_payload(payload)
+    return run
+
+
+@benchmark("inbound.ulaw_to_samples", "frame")
+def bench_ulaw_to_samples():
+    def run(n):
+        for _ in range(n):
+            ulaw_to_samples(ULAW_FRAME)
+    return run
+
+
+@benchmark("inbound.vad_process", "frame")
+def bench_vad():
+    samples = ulaw_to_samples(ULAW_FRAME)
+    vad = VoiceActivityDetector()
+
+    def run(n):
+        for _ in range(n):
+            vad.process(samples)
+    return run
+
+
+# Outbound, per 20 ms frame or per streamed chunk
+
+@benchmark("outbound.pcm16_to_ulaw", "frame")
+def bench_pcm16_to_ulaw():
+    frame = pcm16(0.02, 8000)
+
+    def run(n):
+        for _ in range(n):
+            pcm16_to_ulaw(frame)
+    return run
+
+
+@benchmark("outbound.to_mulaw_resample_24k", "chunk")
+def bench_to_mulaw_resample():
+    chunk = pcm16(TTS_CHUNK_BYTES / 2 / 24000, 24000)
+
+    def run(n):
+        for _ in range(n):
+            AudioHandler.to_mulaw(chunk, 24000, 1)
+    return run
+
+
+@benchmark("outbound.send_mulaw_chunk", "frame")
+def bench_send_mulaw_chunk():
+    websocket = NullWebSocket()
+
+    async def send(n):
+        for _ in range(n):
+            await AudioHandler.send_mulaw_chunk(websocket, "MZ0", ULAW_FRAME, False)
+    return run_async(send)
+
+
+@benchmark("outbound.send_audio_chunk", "frame")
+def bench_send_audio_chunk():
+    # Legacy AudioSegment path: sample width, resample and mu-law export per chunk
+    websocket = NullWebSocket()
+    chunk = AudioSegment(data=pcm16(0.02, 24000), sample_width=2, frame_rate=24000, channels=1)
+
+    async def send(n):
+        for _ in range(n):
+            await AudioHandler.send_audio_chunk(websocket, "MZ0", chunk, False)
+    return run_async(send)
+
+
+@benchmark("outbound.pacer_push_chunks", "second of audio")
+def bench_pacer_push():
+    # Slicing streamed TTS chunks into 20 ms frames, as process_sentence does
+    audio = pcm16_to_ulaw(pcm16(1.0, 8000))
+    chunks = [audio[i:i + TTS_CHUNK_BYTES] for i in range(0, len(audio), TTS_CHUNK_BYTES)]
+
+    async def noop(frame):
+        pass
+
+    pacer = AudioPacer(noop)
+
+    def run(n):
+        for _ in range(n):
+            for chunk in chunks:
+                pacer.push(chunk)
+            pacer.end_utterance()
+            pacer.flush()
+    return run
+
+
+@benchmark("outbound.process_sentence", "second of audio")
+def bench_process_sentence():
+    # Full per-segment path with a pacer that sends instantly
+    audio = pcm16_to_ulaw(pcm16(1.0, 8000))
+    chunks = [audio[i:i + TTS_CHUNK_BYTES] for i in range(0, len(audio), TTS_CHUNK_BYTES)]
+    pipeline = TwilioPipeline.__new__(TwilioPipeline)
+    pipeline.audio_handler = AudioHandler()
+    pipeline.executor = AudioExecutor(threads=0)
+    session = CallSession("bench", StreamManager(None), None)
+    websocket = NullWebSocket()
+
+    async def send(n):
+        session.pacer = AudioPacer(
+            lambda frame: pipeline.audio_handler.send_mulaw_chunk(websocket, "MZ0", frame, False), lead_ms=10 ** 9
+        )
+        session.pacer.start()
+        for _ in range(n):
+            segment = SegmentAudio("bench", MULAW_8K)
+            for chunk in chunks:
+                segment.queue.put_nowait(chunk)
+            segment.queue.put_nowait(None)
+            await pipeline.process_sentence(segment, websocket, session)
+        await session.pacer.stop()
+    return run_async(send)
+
+
+@benchmark("outbound.audiosegment_slice_20ms", "second of audio")
+def bench_audiosegment_slice():
+    audio = AudioSegment(data=pcm16(1.0, 8000), sample_width=2, frame_rate=8000, channels=1)
+
+    def run(n):
+        for _ in range(n):
+            for i in range(0, len(audio), 20):
+                audio[i:i + 20]
+    return run
+
+
+# Per utterance
+
+@benchmark("utterance.set_frame_rate_24k_to_8k", "second of audio")
+def bench_set_frame_rate():
+    audio = AudioSegment(data=pcm16(1.0, 24000), sample_width=2, frame_rate=24000, channels=1)
+
+    def run(n):
+        for _ in range(n):
+            audio.set_frame_rate(8000)
+    return run
+
+
+@benchmark("utterance.mp3_export", "second of audio", needs="ffmpeg")
+def bench_mp3_export():
+    # StandardWebSocketPipeline's per-segment encode
+    audio = AudioSegment(data=pcm16(1.0, 24000), sample_width=2, frame_rate=24000, channels=1)
+
+    def run(n):
+        for _ in range(n):
+            audio.export(io.BytesIO(), format="mp3")
+    return run
+
+
+@benchmark("utterance.mp3_decode", "second of audio", needs="ffmpeg")
+def bench_mp3_decode():
+    buffer = io.BytesIO()
+    AudioSegment(data=pcm16(1.0, 24000), sample_width=2, frame_rate=24000, channels=1).export(buffer, format="mp3")
+    data = buffer.getvalue()
+
+    def run(n):
+        for _ in range(n):
+            AudioSegment.from_file(io.BytesIO(data), format="mp3")
+    return run
+
+
+def measure(bench: Benchmark, repeat: int, min_time: float) -> Dict[str, float]:
+    run = bench.setup()
+    run(1)  # warm caches and lazy imports
+
+    # Calibrate so each timed run lasts about min_time
+    number = 1
+    while True:
+        start = time.perf_counter()
+        run(number)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / 4 or number >= 1 << 24:
+            break
+        number *= 2
+    number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(number)
+        timings.append((time.perf_counter() - start) / number * 1e9)
+    return {
+        "unit": bench.unit,
+        "median_ns": round(statistics.median(timings), 1),
+        "min_ns": round(min(timings), 1),
+        "stdev_ns": round(statistics.stdev(timings), 1) if len(timings) > 1 else 0.0,
+        "ops_per_run": number
+    }
+
+
+def environment() -> Dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "system": platform.system()
+    }
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float) -> List[str]:
+    regressions = []
+    print(f"\n{'benchmark':<40} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before:
+            print(f"{name:<40} {'-':>12} {result['min_ns']:>12.1f} {'new':>8}")
+            continue
+        change = result["min_ns"] / before["min_ns"] - 1
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<40} {before['min_ns']:>12.1f} {result['min_ns']:>12.1f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filter', default='', help='only run benchmarks whose name contains this')
+    parser.add_argument('--repeat', type=int, default=7)
+    parser.add_argument('--min-time', type=float, default=0.2, help='seconds per timed run')
+    parser.add_argument('--save', help='write results as JSON')
+    parser.add_argument('--compare', help='baseline JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.15, help='allowed slowdown, 0.15 = 15%%')
+    args = parser.parse_args()
+
+    results = {}
+    for bench in BENCHMARKS:
+        if args.filter not in bench.name:
+            continue
+        if bench.needs and not which(bench.needs):
+            print(f"{bench.name:<40} skipped, {bench.needs} not found")
+            continue
+        result = measure(bench, args.repeat, args.min_time)
+        results[bench.name] = result
+        print(f"{bench.name:<40} {result['min_ns']:>12.1f} ns/{bench.unit}  (median {result['median_ns']:.1f})")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({"environment": environment(), "results": results}, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("environment") != environment():
+            print("\nWarning: baseline was recorded in a different environment")
+        regressions = compare(results, baseline["results"], args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
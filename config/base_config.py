@@ -6,12 +6,34 @@ import os
 load_dotenv()
 
 
+@dataclass
+class AdmissionConfig:
+    max_concurrent: int = 0  # requests in flight to the provider, 0 for no limit
+    rate: float = 0.0  # budget per second: LLM prompt and reply tokens, TTS characters, STT connections; 0 for no limit
+    burst: float = 0.0  # budget that can be spent at once, one second of rate when unset
+    lookahead_penalty: float = 0.5  # seconds a call's further requests yield to other calls' first ones
+    cost_weight: float = 0.0  # seconds of queue position per unit of cost, puts short requests first
+    retries: int = 2  # retries of a request the provider rejected with 429 before any output
+
+
+@dataclass
+class HedgeConfig:
+    percentile: float = 0.95  # of the primary's time to first audio, past it a second provider is asked too
+    min_deadline: float = 0.25  # seconds, bounds the percentile so hedging stays rare and still helps
+    max_deadline: float = 2.0
+    default_deadline: float = 1.0  # until min_samples responses have been timed
+    min_samples: int = 20
+    window: int = 200  # recent responses per provider the percentile is taken over
+
+
 @dataclass
 class ProviderConfig:
     provider_name: str
     model: Optional[str] = None
     api_key: Optional[str] = None
+    output_format: Optional[str] = None  # audio providers, e.g. "linear16_16000" or "mulaw_8000"
     additional_params: Dict[str, Any] = field(default_factory=dict)
+    admission: AdmissionConfig = field(default_factory=AdmissionConfig)
 
 
 @dataclass
@@ -19,9 +41,57 @@ class PipelineConfig:
     pipeline_type: str  # "twilio" or "websocket"
     chunk_size: int = 8000
     speech_timeout: float = 0.1
+    tts_lookahead: int = 2  # segments synthesized ahead of the one playing
+    min_clause_chars: int = 40  # split on commas/semicolons past this length
+    frame_ms: int = 20  # outbound media frame size
+    pacer_lead_ms: int = 60  # how far ahead of real time audio is sent
+    vad_enabled: bool = True  # local end-of-turn detection and silence suppression
+    vad_threshold_db: float = -45.0
+    vad_end_ms: int = 300  # trailing silence that ends a turn
+    final_wait_ms: int = 700  # further silence to wait for STT to finalize words only seen in an interim
+    silence_hold_ms: int = 1000  # silence still forwarded to STT before holding back
+    barge_in_enabled: bool = True  # caller speech over the reply stops its audio
+    stt_keepalive_s: float = 5.0
+    stt_batch_ms: int = 80  # inbound audio gathered per STT send, flushed early at end of speech
+    speculative_enabled: bool = False  # start the LLM on stable interim transcripts
+    speculative_stable_ms: int = 250
+    speculative_prefetch_tts: bool = True  # also synthesize the first segment speculatively
+    record_dir: Optional[str] = None  # write a replayable recording of every call here
+    max_sessions: int = 0  # calls per worker, more are refused and /ready fails; 0 for no limit
+    executor_threads: int = 4  # for blocking audio work: ffmpeg encodes, resampling
+    executor_processes: int = 0  # >0 moves large transforms to worker processes via shared memory
+    offload_min_bytes: int = 16384  # smaller buffers are cheaper to transform inline
     additional_params: Dict[str, Any] = field(default_factory=dict)
 
 
+@dataclass
+class HTTPPoolConfig:
+    max_connections: int = 20  # per upstream host
+    max_keepalive_connections: int = 10
+    keepalive_expiry: float = 120.0
+    http2: bool = True
+    timeout: float = 30.0
+    connect_timeout: float = 5.0
+    prewarm: bool = True  # resolve DNS and open TLS connections at startup
+    host_max_connections: Dict[str, int] = field(default_factory=dict)  # per-origin overrides
+
+
+@dataclass
+class LoggingConfig:
+    level: str = "INFO"
+    format: str = "json"  # or "text" for local development
+    queue_size: int = 10000  # records past this are dropped, logging never blocks the event loop
+    sample_rates: Dict[str, float] = field(default_factory=lambda: {"DEBUG": 0.1})  # fraction kept per level
+
+
+@dataclass
+class MonitorConfig:
+    loop_lag_interval: float = 0.05  # seconds between event loop heartbeats
+    slow_callback_ms: float = 100  # loop stalls past this are logged with the stack that caused them
+    admin_token: Optional[str] = None  # bearer token for /admin routes, disabled when unset
+    profile_max_seconds: float = 60
+
+
 class BaseConfig:
     def __init__(self):
         # Load environment variables
@@ -48,6 +118,12 @@ class BaseConfig:
             speech_timeout=0.1
         )
 
+        self.http_config = HTTPPoolConfig()
+
+        self.logging_config = LoggingConfig(level=os.getenv('LOG_LEVEL', 'INFO'))
+
+        self.monitor_config = MonitorConfig(admin_token=os.getenv('ADMIN_TOKEN'))
+
     def update_stt_config(self, **kwargs):
         for key, value in kwargs.items():
             if hasattr(self.stt_config, key):
@@ -66,4 +142,19 @@ class BaseConfig:
     def update_pipeline_config(self, **kwargs):
         for key, value in kwargs.items():
             if hasattr(self.pipeline_config, key):
-                setattr(self.pipeline_config, key, value)
\ No newline at end of file
+                setattr(self.pipeline_config, key, value)
+
+    def update_http_config(self, **kwargs):
+        for key, value in kwargs.items():
+            if hasattr(self.http_config, key):
+                setattr(self.http_config, key, value)
+
+    def update_logging_config(self, **kwargs):
+        for key, value in kwargs.items():
+            if hasattr(self.logging_config, key):
+                setattr(self.logging_config, key, value)
+
+    def update_monitor_config(self, **kwargs):
+        for key, value in kwargs.items():
+            if hasattr(self.monitor_config, key):
+                setattr(self.monitor_config, key, value)
\ No newline at end of file
@@ -0,0 +1,167 @@
+"""Simulated Twilio media-stream calls: scripted speech in, reply audio out"""
+import asyncio
+import json
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+import websockets
+
+from utils.audio import encode_media_payload, pcm16_to_ulaw
+
+FRAME_MS = 20
+FRAME_BYTES = 160  # 20 ms of 8 kHz mu-law
+SILENCE_FRAME = b'\xff' * FRAME_BYTES
+BARGE_IN_MS = 500
+
+
+def _speech_frames(seconds: float = 1.0) -> List[bytes]:
+    # A voiced-sounding tone: low fundamental with a couple of harmonics
+    t = np.arange(int(8000 * seconds)) / 8000
+    wave = sum(np.sin(2 * np.pi * f * t) / (i + 1) for i, f in enumerate((180, 360, 540)))
+    pcm = (wave / np.abs(wave).max() * 9000).astype('<i2').tobytes()
+    ulaw = pcm16_to_ulaw(pcm)
+    return [ulaw[i:i + FRAME_BYTES] for i in range(0, len(ulaw), FRAME_BYTES)]
+
+
+SPEECH_FRAMES = _speech_frames()
+
+
+@dataclass
+class CallScript:
+    turns: int = 3
+    utterance_ms: int = 1500
+    pause_ms: int = 1000  # silence after the reply before speaking again
+    reply_timeout_s: float = 15.0
+    reply_gap_ms: int = 600  # no reply audio for this long means the reply is over
+    barge_in_ms: Optional[int] = None  # talk over the reply this long after its audio starts
+
+
+@dataclass
+class CallResult:
+    call_id: str
+    turn_latencies: List[float] = field(default_factory=list)  # end of speech to first reply audio
+    barge_in_latencies: List[float] = field(default_factory=list)  # start of talking over the reply to its clear
+    missed_turns: int = 0
+    frames_received: int = 0
+    error: Optional[str] = None
+    started_at: float = 0.0
+    ended_at: float = 0.0
+
+
+class SimulatedCall:
+    def __init__(self, url: str, script: CallScript):
+        self.url = url
+        self.script = script
+        self.result = CallResult(call_id=uuid.uuid4().hex[:12])
+        self.stream_sid = f"MZ{uuid.uuid4().hex}"
+        self.last_audio_at = 0.0
+        self.first_audio_after: Optional[float] = None
+        self.speech_ended_at: Optional[float] = None
+        self.barge_in_at: Optional[float] = None
+        self.play_until = 0.0  # when the reply audio received so far finishes playing
+        self.marks: Dict[str, asyncio.Task] = {}
+
+    def media(self, frame: bytes) -> str:
+        return json.dumps({
+            "event": "media",
+            "streamSid": self.stream_sid,
+            "media": {"track": "inbound", "payload": encode_media_payload(frame)}
+        })
+
+    async def run(self) -> CallResult:
+        self.result.started_at = time.monotonic()
+        try:
+            async with websockets.connect(self.url, max_size=None) as ws:
+                await ws.send(json.dumps({"event": "connected", "protocol": "Call", "version": "1.0.0"}))
+                await ws.send(json.dumps({
+                    "event": "start",
+                    "streamSid": self.stream_sid,
+                    "start": {"streamSid": self.stream_sid, "callSid": f"CA{self.result.call_id}",
+                              "mediaFormat": {"encoding": "audio/x-mulaw", "sampleRate": 8000, "channels": 1}}
+                }))
+                receiver = asyncio.create_task(self.receive(ws))
+                try:
+                    await self.speak(ws)
+                    await ws.send(json.dumps({"event": "stop", "streamSid": self.stream_sid}))
+                finally:
+                    receiver.cancel()
+        except Exception as e:
+            self.result.error = f"{type(e).__name__}: {e}"
+        self.result.ended_at = time.monotonic()
+        return self.result
+
+    def mark(self, name: str) -> str:
+        return json.dumps({"event": "mark", "streamSid": self.stream_sid, "mark": {"name": name}})
+
+    async def echo_mark(self, ws, name: str, delay: float):
+        await asyncio.sleep(delay)
+        self.marks.pop(name, None)
+        await ws.send(self.mark(name))
+
+    async def receive(self, ws):
+        async for message in ws:
+            data = json.loads(message)
+            event = data.get("event")
+            now = time.monotonic()
+            if event == "media":
+                self.result.frames_received += 1
+                self.last_audio_at = now
+                self.play_until = max(self.play_until, now) + FRAME_MS / 1000
+                if self.speech_ended_at is not None and self.first_audio_after is None:
+                    self.first_audio_after = now
+            elif event == "mark":
+                # Like Twilio, echo it once the audio before it has played
+                name = data["mark"]["name"]
+                self.marks[name] = asyncio.create_task(self.echo_mark(ws, name, max(0.0, self.play_until - now)))
+            elif event == "clear":
+                if self.barge_in_at is not None:
+                    self.result.barge_in_latencies.append(now - self.barge_in_at)
+                    self.barge_in_at = None
+                self.play_until = now
+                for name, task in list(self.marks.items()):
+                    task.cancel()
+                    await ws.send(self.mark(name))
+                self.marks.clear()
+
+    async def speak(self, ws):
+        clock = time.monotonic()
+
+        async def send_frames(frames):
+            # Real-time pacing, like the phone network
+            nonlocal clock
+            for frame in frames:
+                clock += FRAME_MS / 1000
+                await ws.send(self.media(frame))
+                await asyncio.sleep(max(0.0, clock - time.monotonic()))
+
+        def silence(ms):
+            return [SILENCE_FRAME] * (ms // FRAME_MS)
+
+        script = self.script
+        for _ in range(script.turns):
+            frame_count = script.utterance_ms // FRAME_MS
+            await send_frames([SPEECH_FRAMES[i % len(SPEECH_FRAMES)] for i in range(frame_count)])
+            self.speech_ended_at = time.monotonic()
+            self.first_audio_after = None
+
+            # Keep the line open with silence until the reply has played out
+            deadline = self.speech_ended_at + script.reply_timeout_s
+            while time.monotonic() < deadline:
+                await send_frames(silence(100))
+                if script.barge_in_ms is not None and self.first_audio_after and self.barge_in_at is None \
+                        and time.monotonic() - self.first_audio_after >= script.barge_in_ms / 1000:
+                    # Talk over the reply, the server should clear it
+                    self.barge_in_at = time.monotonic()
+                    await send_frames(SPEECH_FRAMES[:BARGE_IN_MS // FRAME_MS])
+                if self.first_audio_after and time.monotonic() - self.last_audio_at > script.reply_gap_ms / 1000:
+                    break
+            if self.first_audio_after:
+                self.result.turn_latencies.append(self.first_audio_after - self.speech_ended_at)
+            else:
+                self.result.missed_turns += 1
+            self.speech_ended_at = None
+            self.barge_in_at = None
+            await send_frames(silence(script.pause_ms))
@@ -0,0 +1,214 @@
+"""Local stand-ins for the Deepgram, Groq and ElevenLabs APIs with scripted latency"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from typing import AsyncIterator
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request, WebSocket
+from fastapi.responses import StreamingResponse
+from fastapi.websockets import WebSocketDisconnect
+
+from loadtest.profiles import MockProfile, PROFILES, load_profile
+from utils.audio import ulaw_to_samples
+
+WORDS = (
+    "could you tell me what time the store opens tomorrow and whether I need to book "
+    "an appointment first or if I can just walk in with my order number"
+).split()
+
+REPLY = (
+    "Sure, I can help with that. We open at nine in the morning on weekdays and ten on weekends. "
+    "You don't need an appointment, just bring your order number and someone at the front desk "
+    "will take care of you. Is there anything else I can help you with today?"
+).split()
+
+VOICED_RMS = 300.0
+FRAME_SAMPLES = 160  # 20 ms at 8 kHz
+
+
+def jitter(ms: int) -> float:
+    return random.uniform(0, ms) / 1000
+
+
+class MockTranscriber:
+    """Energy-based endpointing over mu-law audio, emitting Deepgram-shaped results"""
+
+    def __init__(self, profile: MockProfile, websocket: WebSocket):
+        self.profile = profile.stt
+        self.websocket = websocket
+        self.outbox: asyncio.Queue = asyncio.Queue()
+        self.last_due = 0.0
+        self.speech_ms = 0
+        self.silence_ms = 0
+        self.since_interim_ms = 0
+        self.in_speech = False
+        self.utterances = 0
+        self.offset_s = 0.0
+
+    def feed(self, audio: bytes):
+        samples = ulaw_to_samples(audio).astype(np.float32)
+        for i in range(0, len(samples) - FRAME_SAMPLES + 1, FRAME_SAMPLES):
+            frame = samples[i:i + FRAME_SAMPLES]
+            self.offset_s += 0.02
+            if np.sqrt(np.mean(frame * frame)) > VOICED_RMS:
+                self.in_speech = True
+                self.speech_ms += 20
+                self.since_interim_ms += 20
+                self.silence_ms = 0
+                if self.since_interim_ms >= self.profile.interim_every_ms:
+                    self.since_interim_ms = 0
+                    self.emit(is_final=False)
+            elif self.in_speech:
+                self.silence_ms += 20
+                if self.silence_ms >= self.profile.endpointing_ms:
+                    self.emit(is_final=True)
+                    self.in_speech = False
+                    self.speech_ms = 0
+                    self.since_interim_ms = 0
+                    self.utterances += 1
+
+    def transcript(self) -> str:
+        count = max(1, self.speech_ms // 400)
+        start = self.utterances * 3 % len(WORDS)
+        return ' '.join(WORDS[(start + i) % len(WORDS)] for i in range(count))
+
+    def emit(self, is_final: bool):
+        message = {
+            "type": "Results",
+            "channel_index": [0, 1],
+            "duration": self.speech_ms / 1000,
+            "start": max(0.0, self.offset_s - self.speech_ms / 1000),
+            "is_final": is_final,
+            "speech_final": is_final,
+            "channel": {"alternatives": [{"transcript": self.transcript(), "confidence": 0.98, "words": []}]},
+            "metadata": {
+                "request_id": uuid.uuid4().hex,
+                "model_uuid": "mock",
+                "model_info": {"name": "mock", "version": "0", "arch": "mock"}
+            }
+        }
+        # Results keep their order even when the simulated latency varies
+        due = max(self.last_due, time.monotonic() + (self.profile.final_latency_ms / 1000) + jitter(self.profile.jitter_ms))
+        self.last_due = due
+        self.outbox.put_nowait((due, json.dumps(message)))
+
+    async def send_results(self):
+        while True:
+            due, message = await self.outbox.get()
+            await asyncio.sleep(max(0.0, due - time.monotonic()))
+            await self.websocket.send_text(message)
+
+
+def audio_format(encoding: str, sample_rate: int):
+    bytes_per_ms = sample_rate / 1000 * (1 if encoding in ("mulaw", "ulaw") else 2)
+    silence = b'\xff' if encoding in ("mulaw", "ulaw") else b'\x00'
+    return bytes_per_ms, silence
+
+
+async def stream_audio(profile: MockProfile, text: str, encoding: str, sample_rate: int) -> AsyncIterator[bytes]:
+    tts = profile.tts
+    bytes_per_ms, silence = audio_format(encoding, sample_rate)
+    sample_bytes = 1 if silence == b'\xff' else 2
+    await asyncio.sleep(tts.first_byte_ms / 1000 + jitter(tts.jitter_ms))
+    remaining_ms = max(tts.chunk_ms, len(text) * tts.ms_per_char)
+    while remaining_ms > 0:
+        chunk_ms = min(tts.chunk_ms, remaining_ms)
+        size = int(chunk_ms * bytes_per_ms) // sample_bytes * sample_bytes
+        yield silence * size
+        remaining_ms -= chunk_ms
+        await asyncio.sleep(chunk_ms / 1000 / tts.realtime_factor)
+
+
+def create_mock_app(profile: MockProfile) -> FastAPI:
+    app = FastAPI()
+
+    @app.websocket("/v1/listen")
+    async def listen(websocket: WebSocket):
+        await websocket.accept()
+        transcriber = MockTranscriber(profile, websocket)
+        sender = asyncio.create_task(transcriber.send_results())
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes"):
+                    transcriber.feed(message["bytes"])
+                elif message.get("text") and json.loads(message["text"]).get("type") == "CloseStream":
+                    break
+        except WebSocketDisconnect:
+            pass
+        finally:
+            sender.cancel()
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        llm = profile.llm
+        words = [REPLY[i % len(REPLY)] for i in range(llm.reply_words)]
+
+        async def events():
+            created = int(time.time())
+            await asyncio.sleep(llm.first_token_ms / 1000 + jitter(llm.jitter_ms))
+            for i, word in enumerate(words):
+                chunk = {
+                    "id": "chatcmpl-mock",
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": body.get("model", "mock"),
+                    "system_fingerprint": "mock",
+                    "choices": [{
+                        "index": 0,
+                        "delta": {"role": "assistant", "content": word if i == 0 else f" {word}"},
+                        "logprobs": None,
+                        "finish_reason": None
+                    }]
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(1 / llm.tokens_per_s)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/v1/text-to-speech/{voice_id}/stream")
+    async def elevenlabs_stream(voice_id: str, request: Request, output_format: str = "pcm_16000"):
+        body = await request.json()
+        encoding, rate = output_format.split('_')
+        return StreamingResponse(
+            stream_audio(profile, body.get("text", ""), encoding, int(rate)), media_type="audio/basic"
+        )
+
+    @app.post("/v1/speak")
+    async def deepgram_speak(request: Request, encoding: str = "linear16", sample_rate: int = 24000):
+        body = await request.json()
+        return StreamingResponse(
+            stream_audio(profile, body.get("text", ""), encoding, sample_rate), media_type="audio/basic"
+        )
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok", "profile": profile.to_dict()}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--profile', choices=sorted(PROFILES), default='typical')
+    parser.add_argument('--set', action='append', default=[], metavar='SECTION.FIELD=VALUE',
+                        help='override a profile setting, e.g. llm.first_token_ms=600')
+    args = parser.parse_args()
+
+    profile = load_profile(args.profile, args.set)
+    uvicorn.run(create_mock_app(profile), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+from dataclasses import asdict, dataclass, field, fields
+from typing import Dict, List
+
+
+@dataclass
+class STTProfile:
+    interim_every_ms: int = 300  # speech between interim results
+    endpointing_ms: int = 300  # trailing silence before the final result
+    final_latency_ms: int = 150  # processing delay on every result
+    jitter_ms: int = 30
+
+
+@dataclass
+class LLMProfile:
+    first_token_ms: int = 250
+    tokens_per_s: float = 250.0
+    reply_words: int = 30
+    jitter_ms: int = 50
+
+
+@dataclass
+class TTSProfile:
+    first_byte_ms: int = 200
+    realtime_factor: float = 4.0  # audio seconds streamed per wall-clock second
+    ms_per_char: float = 65.0  # length of synthesized speech
+    chunk_ms: int = 100
+    jitter_ms: int = 40
+
+
+@dataclass
+class MockProfile:
+    stt: STTProfile = field(default_factory=STTProfile)
+    llm: LLMProfile = field(default_factory=LLMProfile)
+    tts: TTSProfile = field(default_factory=TTSProfile)
+
+    def apply(self, overrides: List[str]):
+        """Apply "section.field=value" overrides, e.g. "llm.first_token_ms=600\""""
+        for override in overrides:
+            path, value = override.split('=', 1)
+            section_name, name = path.split('.', 1)
+            section = getattr(self, section_name)
+            if name not in {f.name for f in fields(section)}:
+                raise ValueError(f"Unknown profile setting: {path}")
+            setattr(section, name, type(getattr(section, name))(value))
+        return self
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+PROFILES = {
+    "fast": lambda: MockProfile(
+        STTProfile(final_latency_ms=60, jitter_ms=10),
+        LLMProfile(first_token_ms=120, tokens_per_s=500, jitter_ms=20),
+        TTSProfile(first_byte_ms=90, realtime_factor=8.0, jitter_ms=15)
+    ),
+    "typical": MockProfile,
+    "slow": lambda: MockProfile(
+        STTProfile(final_latency_ms=350, jitter_ms=120),
+        LLMProfile(first_token_ms=700, tokens_per_s=80, jitter_ms=250),
+        TTSProfile(first_byte_ms=500, realtime_factor=1.5, jitter_ms=150)
+    ),
+}
+
+
+def load_profile(name: str, overrides: List[str] = ()) -> MockProfile:
+    return PROFILES[name]().apply(overrides)
@@ -0,0 +1,261 @@
+"""Replay a recorded call through TwilioPipeline with providers stubbed from the recording
+
+    python -m loadtest.replay recordings/3f2a....vrec
+    python -m loadtest.replay recordings/3f2a....vrec --speed 4 --json run.json
+
+Inbound audio, transcripts, LLM tokens and TTS audio are fed back with their
+recorded timing, scaled by --speed, so two builds can be compared on identical
+input. Outbound audio is paced in real time only at --speed 1. Turn timings
+are reported on the recorded time scale whatever the speed.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import time
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, List, Optional, Tuple
+
+from config.base_config import BaseConfig, ProviderConfig
+from pipelines.twilio_pipeline import TwilioPipeline
+from providers.llm.base import BaseLLMProvider
+from providers.stt.base import BaseSTTProvider, STTSession
+from providers.tts.base import AudioFormat, BaseTTSProvider
+from services.recorder import (
+    INBOUND_AUDIO, INBOUND_EVENT, LLM_REQUEST, LLM_TOKEN, META, STT_EVENT, TTS_AUDIO, TTS_REQUEST,
+    Record, read_recording
+)
+from services.session import CallSession
+from services.speculation import messages_key
+
+Timed = List[Tuple[float, bytes]]  # (seconds after the request, payload)
+
+
+class ReplayClock:
+    def __init__(self, speed: float = 1.0):
+        self.speed = speed
+        self.started = time.monotonic()
+
+    def begin(self):
+        self.started = time.monotonic()
+
+    async def sleep_until(self, t: float, origin: Optional[float] = None):
+        """Sleep until recorded time t, measured from origin (the replay start by default)"""
+        origin = self.started if origin is None else origin
+        await asyncio.sleep(max(0.0, origin + t / self.speed - time.monotonic()))
+
+
+class Recording:
+    """A recording indexed for replay"""
+
+    def __init__(self, path: str):
+        self.meta: Dict = {}
+        self.inbound: List[Record] = []
+        self.stt_events: List[Record] = []
+        self.llm_by_key: Dict[tuple, Deque[Timed]] = defaultdict(deque)
+        self.llm_in_order: Deque[Timed] = deque()
+        self.tts_by_key: Dict[Tuple[str, str], Deque[Timed]] = defaultdict(deque)
+        self.tts_formats: List[str] = []
+
+        requests: Dict[int, Tuple[Record, Timed]] = {}
+        for record in read_recording(path):
+            if record.kind == META and not self.meta:
+                self.meta = record.json()
+            elif record.kind in (INBOUND_AUDIO, INBOUND_EVENT):
+                self.inbound.append(record)
+            elif record.kind == STT_EVENT:
+                self.stt_events.append(record)
+            elif record.kind == LLM_REQUEST:
+                timed: Timed = []
+                requests[record.stream] = (record, timed)
+                self.llm_by_key[messages_key(record.json())].append(timed)
+                self.llm_in_order.append(timed)
+            elif record.kind == TTS_REQUEST:
+                timed = []
+                requests[record.stream] = (record, timed)
+                request = record.json()
+                self.tts_by_key[(request["text"], request["format"])].append(timed)
+                if request["format"] not in self.tts_formats:
+                    self.tts_formats.append(request["format"])
+            elif record.kind in (LLM_TOKEN, TTS_AUDIO) and record.stream in requests:
+                request, timed = requests[record.stream]
+                timed.append((record.t - request.t, record.payload))
+
+    def take_llm(self, messages) -> Optional[Timed]:
+        # Prefer the response to the same context, else the next one in call order
+        matches = self.llm_by_key.get(messages_key(messages))
+        if matches:
+            timed = matches.popleft()
+        elif self.llm_in_order:
+            timed = self.llm_in_order[0]
+            for candidates in self.llm_by_key.values():
+                if timed in candidates:
+                    candidates.remove(timed)
+                    break
+        else:
+            return None
+        self.llm_in_order.remove(timed)
+        return timed
+
+
+class ReplaySTT(BaseSTTProvider):
+    def __init__(self, recording: Recording, clock: ReplayClock):
+        super().__init__(ProviderConfig(provider_name="replay"))
+        self.recording = recording
+        self.clock = clock
+
+    @asynccontextmanager
+    async def create_connection(self, session: STTSession, **kwargs):
+        async def feed():
+            for record in self.recording.stt_events:
+                await self.clock.sleep_until(record.t)
+                await session.transcript_queue.put(record.json())
+
+        class Connection:
+            async def send(self, data):
+                pass
+
+        task = asyncio.create_task(feed())
+        try:
+            yield Connection()
+        finally:
+            task.cancel()
+
+    async def process_audio(self, session: STTSession, audio_data: bytes):
+        pass
+
+    async def get_transcript(self, session: STTSession):
+        return await session.transcript_queue.get()
+
+
+class ReplayLLM(BaseLLMProvider):
+    def __init__(self, recording: Recording, clock: ReplayClock):
+        super().__init__(ProviderConfig(provider_name="replay", model="replay"))
+        self.recording = recording
+        self.clock = clock
+        self.misses = 0
+
+    async def stream_response(self, messages, **kwargs):
+        requested = time.monotonic()
+        timed = self.recording.take_llm(messages)
+        if timed is None:
+            self.misses += 1
+            return
+        for offset, token in timed:
+            await self.clock.sleep_until(offset, requested)
+            yield token.decode()
+
+
+class ReplayTTS(BaseTTSProvider):
+    def __init__(self, recording: Recording, clock: ReplayClock):
+        self.supported_formats = tuple(AudioFormat.parse(name) for name in recording.tts_formats) or \
+            BaseTTSProvider.supported_formats
+        super().__init__(ProviderConfig(provider_name="replay", output_format=self.supported_formats[0].name))
+        self.recording = recording
+        self.clock = clock
+        self.misses = 0
+
+    async def stream_speech(self, text: str, audio_format: Optional[AudioFormat] = None):
+        fmt = audio_format or self.output_format
+        requested = time.monotonic()
+        matches = self.recording.tts_by_key.get((text, fmt.name))
+        if not matches:
+            # Text the recorded call never synthesized, stand in with silence of a plausible length
+            self.misses += 1
+            silence = b'\xff' if fmt.encoding == "mulaw" else b'\x00\x00'
+            yield silence * int(len(text) * 0.065 * fmt.sample_rate)
+            return
+        for offset, chunk in matches.popleft():
+            await self.clock.sleep_until(offset, requested)
+            yield chunk
+
+
+class ReplayWebSocket:
+    """Stands in for Twilio's media stream websocket"""
+
+    def __init__(self, recording: Recording, clock: ReplayClock):
+        self.recording = recording
+        self.clock = clock
+        self.stream_sid = "MZreplay"
+        self.frames_sent = 0
+
+    async def accept(self):
+        self.clock.begin()
+
+    async def iter_text(self):
+        for record in self.recording.inbound:
+            await self.clock.sleep_until(record.t)
+            if record.kind == INBOUND_EVENT:
+                yield record.payload.decode()
+            else:
+                yield json.dumps({
+                    "event": "media",
+                    "streamSid": self.stream_sid,
+                    "media": {"payload": base64.b64encode(record.payload).decode('ascii')}
+                })
+        # Let the last reply play out before hanging up
+        await asyncio.sleep(1.0)
+
+    async def send_text(self, data: str):
+        self.frames_sent += 1
+
+
+class ReplayPipeline(TwilioPipeline):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.finished_sessions: List[CallSession] = []
+
+    def end_session(self, session: CallSession):
+        self.finished_sessions.append(session)
+        super().end_session(session)
+
+
+async def replay(path: str, speed: float = 1.0) -> Dict:
+    recording = Recording(path)
+    clock = ReplayClock(speed)
+    config = BaseConfig()
+    if recording.meta.get("pipeline") != "TwilioPipeline":
+        # Browser audio is not mu-law, rely on the recorded transcripts for turn taking
+        config.update_pipeline_config(vad_enabled=False)
+    if speed != 1:
+        config.update_pipeline_config(pacer_lead_ms=10 ** 9)
+
+    llm = ReplayLLM(recording, clock)
+    tts = ReplayTTS(recording, clock)
+    pipeline = ReplayPipeline(ReplaySTT(recording, clock), llm, tts, config)
+    websocket = ReplayWebSocket(recording, clock)
+
+    started = time.monotonic()
+    await pipeline.process(websocket)
+    session = pipeline.finished_sessions[0]
+    return {
+        "recording": path,
+        "meta": recording.meta,
+        "speed": speed,
+        "wall_seconds": round(time.monotonic() - started, 3),
+        "frames_sent": websocket.frames_sent,
+        "llm_misses": llm.misses,
+        "tts_misses": tts.misses,
+        "turns": [{stage: round(t * speed, 4) for stage, t in turn.items()} for turn in session.turn_timings]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('recording')
+    parser.add_argument('--speed', type=float, default=1.0, help='time scale, 4 replays four times faster')
+    parser.add_argument('--json', help='also write the result to this file')
+    args = parser.parse_args()
+    if args.speed <= 0:
+        parser.error("--speed must be positive")
+
+    result = asyncio.run(replay(args.recording, args.speed))
+    print(json.dumps(result, indent=2))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
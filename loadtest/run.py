@@ -0,0 +1,180 @@
+"""Capacity test: N concurrent simulated Twilio calls against the pipeline and stand-in providers
+
+    python -m loadtest.run --calls 50 --ramp-s 10 --turns 3 --profile typical
+    python -m loadtest.run --calls 20 --set llm.first_token_ms=800
+
+Starts the stand-in providers and the server under test as subprocesses unless
+--server-url is given, then reports calls sustained per core, turn latency
+percentiles, event loop lag and memory per session.
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Sequence
+
+import httpx
+
+from loadtest.caller import CallResult, CallScript, SimulatedCall
+from loadtest.profiles import PROFILES
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(values: Sequence[float], scale: float = 1000) -> Dict[str, float]:
+    return {
+        name: round(percentile(values, pct) * scale, 1)
+        for name, pct in (("p50", 50), ("p90", 90), ("p99", 99), ("max", 100))
+    }
+
+
+async def wait_ready(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"{url} did not come up within {timeout}s")
+                await asyncio.sleep(0.2)
+
+
+class StatsPoller:
+    """Samples the server's CPU, memory, lag and session count while calls run"""
+
+    def __init__(self, url: str, interval: float = 1.0):
+        self.url = url
+        self.interval = interval
+        self.samples: List[Dict] = []
+        self.loop_lag: List[float] = []
+
+    async def poll(self, client: httpx.AsyncClient) -> Dict:
+        sample = (await client.get(self.url)).json()
+        self.loop_lag.extend(sample.pop("loop_lag"))
+        self.samples.append(sample)
+        return sample
+
+    async def run(self):
+        async with httpx.AsyncClient() as client:
+            while True:
+                await self.poll(client)
+                await asyncio.sleep(self.interval)
+
+
+def spawn(module: str, *args: str, log: Optional[str] = None) -> subprocess.Popen:
+    output = open(log, 'w') if log else subprocess.DEVNULL
+    return subprocess.Popen([sys.executable, '-m', module, *args], stdout=output, stderr=subprocess.STDOUT)
+
+
+async def run_calls(url: str, script: CallScript, calls: int, ramp_s: float) -> List[CallResult]:
+    async def start(i: int) -> CallResult:
+        await asyncio.sleep(ramp_s * i / max(1, calls))
+        return await SimulatedCall(url, script).run()
+
+    return await asyncio.gather(*(start(i) for i in range(calls)))
+
+
+def report(results: List[CallResult], poller: StatsPoller, calls: int) -> Dict:
+    baseline, samples = poller.samples[0], poller.samples[1:] or poller.samples
+    last = samples[-1]
+    wall = last["time"] - baseline["time"]
+    cores_used = (last["cpu_seconds"] - baseline["cpu_seconds"]) / wall if wall > 0 else 0.0
+    peak_sessions = max(s["active_sessions"] for s in samples)
+    peak_rss = max(s["rss_bytes"] for s in samples)
+
+    failed = [r for r in results if r.error]
+    latencies = [latency for r in results for latency in r.turn_latencies]
+    healthy = calls - len(failed)
+    return {
+        "calls": calls,
+        "failed_calls": len(failed),
+        "errors": sorted({r.error for r in failed})[:5],
+        "turns": len(latencies),
+        "missed_turns": sum(r.missed_turns for r in results),
+        "peak_sessions": peak_sessions,
+        "server_cores_used": round(cores_used, 3),
+        # Concurrency the server would hold at one fully busy core, at this latency
+        "calls_per_core": round(healthy / cores_used, 1) if cores_used else None,
+        "turn_latency_ms": summarize(latencies),
+        "barge_in_latency_ms": summarize([latency for r in results for latency in r.barge_in_latencies]),
+        "loop_lag_ms": summarize(poller.loop_lag),
+        "rss_mb": round(peak_rss / 2 ** 20, 1),
+        "memory_per_session_kb": round((peak_rss - baseline["rss_bytes"]) / peak_sessions / 1024, 1)
+        if peak_sessions else None,
+    }
+
+
+async def main_async(args) -> Dict:
+    processes = []
+    server_url = args.server_url
+    try:
+        if not server_url:
+            mock_url = f"http://127.0.0.1:{args.mock_port}"
+            processes.append(spawn(
+                'loadtest.mock_providers', '--port', str(args.mock_port), '--profile', args.profile,
+                *(arg for override in args.set for arg in ('--set', override))
+            ))
+            await wait_ready(f"{mock_url}/health")
+            processes.append(spawn(
+                'loadtest.server', '--port', str(args.port), '--mock-url', mock_url,
+                *(('--record-dir', args.record_dir) if args.record_dir else ()), log=args.server_log
+            ))
+            server_url = f"http://127.0.0.1:{args.port}"
+        await wait_ready(f"{server_url}/loadtest/stats")
+
+        poller = StatsPoller(f"{server_url}/loadtest/stats")
+        async with httpx.AsyncClient() as client:
+            await asyncio.sleep(1.0)
+            await poller.poll(client)
+            poller.loop_lag.clear()
+        polling = asyncio.create_task(poller.run())
+
+        script = CallScript(
+            turns=args.turns, utterance_ms=args.utterance_ms, pause_ms=args.pause_ms, barge_in_ms=args.barge_in_ms
+        )
+        ws_url = server_url.replace('http', 'ws', 1) + "/media-stream"
+        results = await run_calls(ws_url, script, args.calls, args.ramp_s)
+
+        polling.cancel()
+        async with httpx.AsyncClient() as client:
+            await poller.poll(client)
+        return report(results, poller, args.calls)
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=10)
+    parser.add_argument('--ramp-s', type=float, default=5.0, help='spread call starts over this many seconds')
+    parser.add_argument('--turns', type=int, default=3)
+    parser.add_argument('--utterance-ms', type=int, default=1500)
+    parser.add_argument('--pause-ms', type=int, default=1000)
+    parser.add_argument('--barge-in-ms', type=int, help='talk over each reply this long after its audio starts')
+    parser.add_argument('--profile', choices=sorted(PROFILES), default='typical')
+    parser.add_argument('--set', action='append', default=[], metavar='SECTION.FIELD=VALUE',
+                        help='override a stand-in provider setting, e.g. tts.first_byte_ms=400')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--mock-port', type=int, default=8100)
+    parser.add_argument('--server-url', help='test an already running server instead of starting one')
+    parser.add_argument('--server-log', help='write the server output to this file')
+    parser.add_argument('--record-dir', help='have the server record every call for loadtest.replay')
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(main_async(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
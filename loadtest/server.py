@@ -0,0 +1,117 @@
+"""The Twilio pipeline wired to the local stand-in providers, plus a stats route for the load runner"""
+import argparse
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional
+
+import psutil
+import uvicorn
+
+from app.factory import AppFactory
+from app.routes import register_routes
+from config.base_config import BaseConfig, ProviderConfig
+from pipelines.twilio_pipeline import TwilioPipeline
+from providers.llm.groq import GroqLLM
+from providers.llm.scheduled import ScheduledLLMProvider
+from providers.stt.deepgram import DeepgramSTT
+from providers.stt.scheduled import ScheduledSTTProvider
+from providers.tts.elevenlabs import ElevenLabsTTS
+from providers.tts.scheduled import ScheduledTTSProvider
+
+
+class LoopLagSampler:
+    """Measures how late a periodic sleep wakes up, i.e. event loop lag"""
+
+    def __init__(self, interval: float = 0.05, keep: int = 20000):
+        self.interval = interval
+        self.keep = keep
+        self.samples: List[float] = []
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - start - self.interval))
+            if len(self.samples) > self.keep:
+                del self.samples[:len(self.samples) - self.keep]
+
+    def drain(self) -> List[float]:
+        samples, self.samples = self.samples, []
+        return samples
+
+
+def create_pipeline(mock_url: str, record_dir: Optional[str] = None) -> TwilioPipeline:
+    config = BaseConfig()
+    config.update_pipeline_config(record_dir=record_dir)
+    ws_url = mock_url.replace('http', 'ws', 1)
+    config.stt_config = ProviderConfig(
+        provider_name="deepgram",
+        api_key="loadtest",
+        additional_params={
+            'base_url': ws_url,
+            'encoding': 'mulaw',
+            'sample_rate': 8000,
+            'pool_size': int(os.getenv('DEEPGRAM_POOL_SIZE', 4))
+        }
+    )
+    config.llm_config = ProviderConfig(
+        provider_name="groq",
+        api_key="loadtest",
+        model="llama3-8b-8192",
+        additional_params={'base_url': mock_url}
+    )
+    config.tts_config = ProviderConfig(
+        provider_name="elevenlabs",
+        api_key="loadtest",
+        output_format="mulaw_8000",
+        additional_params={'base_url': mock_url, 'voice_id': 'loadtest'}
+    )
+    return TwilioPipeline(
+        stt_provider=ScheduledSTTProvider(DeepgramSTT(config.stt_config)),
+        llm_provider=ScheduledLLMProvider(GroqLLM(config.llm_config)),
+        tts_provider=ScheduledTTSProvider(ElevenLabsTTS(config.tts_config)),
+        config=config
+    )
+
+
+def create_app(mock_url: str, record_dir: Optional[str] = None):
+    pipeline = create_pipeline(mock_url, record_dir)
+    app = AppFactory.create_app(pipeline.config, pipeline)
+    register_routes(app)
+    process = psutil.Process()
+    sampler = LoopLagSampler()
+
+    @app.get("/loadtest/stats")
+    async def stats() -> Dict:
+        # The runner polls this from the start, so the first poll starts sampling
+        sampler.start()
+        cpu = process.cpu_times()
+        return {
+            "time": time.monotonic(),
+            "cpu_seconds": cpu.user + cpu.system,
+            "rss_bytes": process.memory_info().rss,
+            "active_sessions": pipeline.session_factory.active_count,
+            "loop_lag": sampler.drain()
+        }
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--mock-url', default='http://127.0.0.1:8100')
+    parser.add_argument('--record-dir', help='record every call for loadtest.replay')
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.mock_url, args.record_dir), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,19 @@
 # main.py
+import argparse
 import uvicorn
 from dotenv import load_dotenv
-from config.base_config import BaseConfig, ProviderConfig
+from config.base_config import AdmissionConfig, BaseConfig, HedgeConfig, ProviderConfig
 from config.prompts.base_prompts import BasePrompts
 from providers.stt.deepgram import DeepgramSTT
+from providers.stt.scheduled import ScheduledSTTProvider
 from providers.llm.groq import GroqLLM
+from providers.llm.cache import CachedLLMProvider
+from providers.llm.scheduled import ScheduledLLMProvider
 from providers.tts.elevenlabs import ElevenLabsTTS
+from providers.tts.deepgram import DeepgramTTS
+from providers.tts.cache import CachedTTSProvider
+from providers.tts.hedged import HedgedTTSProvider
+from providers.tts.scheduled import ScheduledTTSProvider
 from pipelines.standard_websocket import StandardWebSocketPipeline
 from app.factory import AppFactory
 import os
@@ -23,28 +31,59 @@ def create_websocket_pipeline():
         api_key=os.getenv('ELEVENLABS_API_KEY'),
         additional_params={
             'voice_id': os.getenv('ELEVENLABS_VOICE_ID', 'default')  # Replace with your voice ID
-        }
+        },
+        # Limits are per worker process, divide the account's limits by the worker count
+        admission=AdmissionConfig(
+            max_concurrent=int(os.getenv('ELEVENLABS_CONCURRENCY', '0')),
+            rate=float(os.getenv('ELEVENLABS_CHARS_PER_SECOND', '0')),
+            cost_weight=0.002  # a 40 character opening sentence ranks 0.3 s ahead of a 200 character one
+        )
     )
 
     # Configure other providers
     config.stt_config = ProviderConfig(
         provider_name="deepgram",
         api_key=os.getenv('DEEPGRAM_API_KEY'),
-        model="nova-2"
+        model="nova-2",
+        additional_params={
+            'pool_size': int(os.getenv('DEEPGRAM_POOL_SIZE', '2'))  # warm live connections
+        },
+        admission=AdmissionConfig(max_concurrent=int(os.getenv('DEEPGRAM_CONCURRENCY', '0')))
     )
 
     config.llm_config = ProviderConfig(
         provider_name="groq",
         api_key=os.getenv('GROQ_API_KEY'),
-        model="llama3-8b-8192"
+        model="llama3-8b-8192",
+        admission=AdmissionConfig(
+            max_concurrent=int(os.getenv('GROQ_CONCURRENCY', '0')),
+            rate=float(os.getenv('GROQ_TOKENS_PER_MINUTE', '0')) / 60
+        )
     )
 
     config.pipeline_config.pipeline_type = "websocket"
+    config.pipeline_config.max_sessions = int(os.getenv('MAX_SESSIONS', '0'))  # per worker
 
     # Initialize providers
-    stt_provider = DeepgramSTT(config.stt_config)
-    llm_provider = GroqLLM(config.llm_config)
-    tts_provider = ElevenLabsTTS(config.tts_config)
+    # Cache hits are answered before admission, only real provider requests queue
+    stt_provider = ScheduledSTTProvider(DeepgramSTT(config.stt_config))
+    llm_provider = CachedLLMProvider(
+        ScheduledLLMProvider(GroqLLM(config.llm_config)),
+        shared_dir=os.getenv('LLM_CACHE_DIR')  # shared with the other workers on the host
+    )
+    tts_provider = ScheduledTTSProvider(ElevenLabsTTS(config.tts_config))
+    if os.getenv('TTS_FALLBACK') == 'deepgram':
+        # Slow or failed ElevenLabs segments are also asked of Deepgram, in Deepgram's voice
+        fallback_config = ProviderConfig(provider_name="deepgram", api_key=os.getenv('DEEPGRAM_API_KEY'))
+        tts_provider = HedgedTTSProvider(
+            [tts_provider, ScheduledTTSProvider(DeepgramTTS(fallback_config))],
+            HedgeConfig(percentile=float(os.getenv('TTS_HEDGE_PERCENTILE', '0.95')))
+        )
+    tts_provider = CachedTTSProvider(
+        tts_provider,
+        memory_bytes=int(os.getenv('TTS_MEMORY_CACHE_MB', '64')) * 1024 * 1024,
+        cache_dir=os.getenv('TTS_CACHE_DIR')  # memory-only cache when unset
+    )
 
     # Create prompts
     prompts = BasePrompts()
@@ -66,19 +105,33 @@ def create_websocket_pipeline():
     )
 
 
-def main():
+def create_app():
+    # Called once per worker process, each builds its own providers
     pipeline = create_websocket_pipeline()
     app = AppFactory.create_app(pipeline.config, pipeline)
 
     # Register routes
     from app.routes import register_routes
     register_routes(app)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=int(os.getenv('WORKERS', '1')))
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        from app.workers import WorkerSupervisor
+        WorkerSupervisor("main:create_app", port=args.port, workers=args.workers).run()
+        return
 
     # Run with CORS enabled for frontend access
     uvicorn.run(
-        app,
+        create_app(),
         host="0.0.0.0",
-        port=8000,
+        port=args.port,
         log_level="info"
     )
 
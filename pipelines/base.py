@@ -1,10 +1,23 @@
+import logging
+import os
 from abc import ABC, abstractmethod
-from typing import Optional, Any
+from typing import Optional, Any, AsyncIterator, Callable, Dict, List
 from providers.stt.base import BaseSTTProvider
 from providers.llm.base import BaseLLMProvider
-from providers.tts.base import BaseTTSProvider
+from providers.tts.base import AudioFormat, BaseTTSProvider
 from config.base_config import BaseConfig
 from config.prompts.base_prompts import BasePrompts
+from services.executor import AudioExecutor
+from services.loop_monitor import loop_monitor
+from services.metrics import TurnTimer, timed_segments, timed_tokens
+from services.recorder import SessionRecorder
+from services.segmenter import SentenceSegmenter, segment_text
+from services.session import CallSession, SessionFactory
+from services.speculation import SpeculativeGenerator, SpeculativeRun, cancel_on_close
+from services.speech_stream import SegmentAudio, SpeechStream
+from utils.logging import bind_session
+
+logger = logging.getLogger(__name__)
 
 class BasePipeline(ABC):
     def __init__(
@@ -20,12 +33,104 @@ class BasePipeline(ABC):
         self.tts = tts_provider
         self.config = config
         self.prompts = prompts or BasePrompts()
+        self.session_factory = SessionFactory(self.stt, self.tts)
+        pipeline_config = config.pipeline_config
+        self.executor = AudioExecutor(
+            threads=pipeline_config.executor_threads,
+            processes=pipeline_config.executor_processes,
+            offload_min_bytes=pipeline_config.offload_min_bytes
+        )
+
+    async def refuse_if_full(self, websocket) -> bool:
+        """Turn the call away before accepting it when this worker already has max_sessions calls"""
+        limit = self.config.pipeline_config.max_sessions
+        active = self.session_factory.active_count
+        if not limit or active < limit:
+            return False
+        logger.warning("Refusing call, worker at capacity", extra={'active_sessions': active, 'max_sessions': limit})
+        await websocket.close(code=1013)  # try again later
+        return True
+
+    def create_session(self) -> CallSession:
+        session = self.session_factory.create_session()
+        # Log records from this call's tasks, created from here on, carry its id
+        bind_session(session.session_id)
+        loop_monitor.tag_session(session.session_id)
+        record_dir = self.config.pipeline_config.record_dir
+        if record_dir:
+            os.makedirs(record_dir, exist_ok=True)
+            session.recorder = SessionRecorder(
+                os.path.join(record_dir, f"{session.session_id}.vrec"),
+                meta={"pipeline": type(self).__name__, "session_id": session.session_id}
+            )
+        return session
+
+    def end_session(self, session: CallSession):
+        self.session_factory.release(session)
+
+    def create_segmenter(self) -> SentenceSegmenter:
+        return SentenceSegmenter(min_clause_chars=self.config.pipeline_config.min_clause_chars)
+
+    def create_speech_stream(
+        self, audio_format: Optional[AudioFormat] = None, recorder: Optional[SessionRecorder] = None
+    ) -> SpeechStream:
+        return SpeechStream(self.tts, self.config.pipeline_config.tts_lookahead, audio_format, recorder)
+
+    def create_speculator(
+        self,
+        build_messages: Callable[[str], List[Dict[str, str]]],
+        audio_format: Optional[AudioFormat] = None,
+        recorder: Optional[SessionRecorder] = None
+    ) -> Optional[SpeculativeGenerator]:
+        pipeline_config = self.config.pipeline_config
+        if not pipeline_config.speculative_enabled:
+            return None
+        prefetch = None
+        if pipeline_config.speculative_prefetch_tts:
+            prefetch = self.create_speech_stream(audio_format, recorder).start_segment
+        return SpeculativeGenerator(
+            self.llm,
+            build_messages,
+            stable_ms=pipeline_config.speculative_stable_ms,
+            segmenter_factory=self.create_segmenter,
+            prefetch=prefetch
+        )
+
+    def stream_reply(
+        self,
+        messages: List[Dict[str, str]],
+        audio_format: Optional[AudioFormat] = None,
+        speculative_run: Optional[SpeculativeRun] = None,
+        turn: Optional[TurnTimer] = None,
+        recorder: Optional[SessionRecorder] = None
+    ) -> AsyncIterator[SegmentAudio]:
+        """Stream the LLM reply as synthesized segments in playback order"""
+        if speculative_run:
+            tokens, prefetched = speculative_run.replay(), speculative_run.first_segment
+        else:
+            tokens, prefetched = self.llm.stream_response(messages), None
+        if recorder:
+            tokens = recorder.llm_stream(messages, tokens)
+        if turn:
+            turn.mark("llm_request", at=speculative_run.started_at if speculative_run else None)
+            tokens = timed_tokens(tokens, turn)
+        segments = segment_text(tokens, self.create_segmenter())
+        stream = self.create_speech_stream(audio_format, recorder).stream(segments, prefetched)
+        if speculative_run:
+            # Once committed the run belongs to this reply, nothing else would stop it
+            stream = cancel_on_close(stream, speculative_run)
+        return timed_segments(stream, turn) if turn else stream
 
     @abstractmethod
     async def process(self, input_data: Any) -> Any:
         pass
 
+    async def startup(self):
+        await self.stt.startup()
+
     async def cleanup(self):
+        # Shared provider clients are closed once, at application shutdown
         await self.stt.cleanup()
         await self.llm.cleanup()
-        await self.tts.cleanup()
\ No newline at end of file
+        await self.tts.cleanup()
+        self.executor.shutdown()
\ No newline at end of file
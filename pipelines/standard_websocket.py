@@ -1,110 +1,136 @@
 # pipelines/standard_websocket.py
-import io
 import asyncio
+import logging
 import re
 import string
 from fastapi import WebSocket
 from fastapi.websockets import WebSocketDisconnect, WebSocketState
+from services.audio_handler import AudioHandler
+from services.recorder import INBOUND_AUDIO, STT_EVENT
+from services.session import CallSession
 from .base import BasePipeline
 
+logger = logging.getLogger(__name__)
 
-class StandardWebSocketPipeline(BasePipeline):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.finish_event = asyncio.Event()
-        self.message_history = []
-        self.max_history = 5  # Keep last 10 messages by default
 
+class StandardWebSocketPipeline(BasePipeline):
     def should_end_conversation(self, text: str) -> bool:
         text = text.translate(str.maketrans('', '', string.punctuation))
         text = text.strip().lower()
         return re.search(r'\b(goodbye|bye)\b$', text) is not None
 
-    def add_to_history(self, role: str, content: str):
-        self.message_history.append({"role": role, "content": content})
-        # Keep only the last N messages
-        if len(self.message_history) > self.max_history:
-            self.message_history = self.message_history[-self.max_history:]
-
-    def get_messages_for_llm(self, user_input: str):
+    def get_messages_for_llm(self, session: CallSession, user_input: str):
         # System prompt stays the same
         messages = [{"role": "system", "content": self.prompts.current_template.system_prompt}]
 
         # Add historical context
-        messages.extend(self.message_history)
+        messages.extend(session.message_history)
 
         # Add current user input
         messages.append({"role": "user", "content": user_input})
 
         return messages
 
-    async def handle_audio_stream(self, websocket: WebSocket):
+    async def handle_audio_stream(self, websocket: WebSocket, session: CallSession):
         try:
-            while not self.finish_event.is_set():
+            while not session.finish_event.is_set():
                 data = await websocket.receive_bytes()
-                await self.stt.process_audio(data)
+                if session.recorder:
+                    session.recorder.write(INBOUND_AUDIO, data)
+                await self.stt.process_audio(session.stt_session, data)
         except Exception as e:
-            print(f"Error in handle_audio_stream: {e}")
+            logger.error("Error in handle_audio_stream: %s", e)
 
-    async def handle_transcripts(self, websocket: WebSocket):
-        while not self.finish_event.is_set():
+    async def handle_transcripts(self, websocket: WebSocket, session: CallSession):
+        while not session.finish_event.is_set():
             try:
-                transcript = await self.stt.get_transcript()
+                transcript = await self.stt.get_transcript(session.stt_session)
+                if session.recorder:
+                    session.recorder.write_json(STT_EVENT, transcript)
 
                 # Send interim or final transcripts to frontend
                 await websocket.send_json(transcript)
 
+                if transcript['type'] == 'transcript_interim' and session.speculator:
+                    parts = session.stt_session.transcript_parts
+                    session.speculator.observe(' '.join(parts + [transcript['content']]))
+
                 # Process final transcripts for AI response
                 if transcript['type'] == 'speech_final':
+                    # Deepgram's endpointing is the end-of-speech signal here
+                    session.turn.mark("speech_end")
+                    session.turn.mark("final_transcript")
                     user_input = transcript['content']
 
                     if self.should_end_conversation(user_input):
-                        self.finish_event.set()
+                        session.finish_event.set()
                         await websocket.send_json({'type': 'finish'})
                         break
 
-                    # Add user message to history
-                    self.add_to_history("user", user_input)
+                    # Build the context before this turn joins the history
+                    messages = self.get_messages_for_llm(session, user_input)
+                    run = session.speculator.commit(user_input) if session.speculator else None
 
-                    # Generate AI response with context
-                    messages = self.get_messages_for_llm(user_input)
-                    response = await self.llm.generate_response(messages)
+                    # Add user message to history
+                    session.add_to_history("user", user_input)
+
+                    # Generate AI response with context, streaming audio per segment
+                    turn = session.start_reply()
+                    sentences = []
+                    reply = self.stream_reply(messages, speculative_run=run, turn=turn, recorder=session.recorder)
+                    try:
+                        async for segment in reply:
+                            sentences.append(segment.text)
+                            fmt = segment.format
+                            # The mp3 encode waits on ffmpeg whatever the size, always off the loop
+                            mp3 = await self.executor.run(
+                                AudioHandler.to_mp3, await segment.pcm16(), fmt.sample_rate, fmt.channels
+                            )
+                            # Each segment's text goes out just ahead of its audio, as the whole reply's did
+                            await websocket.send_json({
+                                'type': 'assistant',
+                                'content': segment.text
+                            })
+                            await websocket.send_bytes(mp3)
+                            turn.mark("first_frame_sent")
+                            turn.mark("last_frame_sent")
+                    finally:
+                        await reply.aclose()
+                        logger.info("Turn timings", extra={'timings': turn.offsets()})
+                        session.finish_reply()
+                    response = ' '.join(sentences)
 
                     # Add assistant response to history
-                    self.add_to_history("assistant", response)
-
-                    # Send text response
-                    await websocket.send_json({
-                        'type': 'assistant',
-                        'content': response
-                    })
-
-                    # Generate and stream audio response
-                    audio = await self.tts.text_to_speech(response)
-                    buffer = io.BytesIO()
-                    audio.export(buffer, format="mp3")
-                    await websocket.send_bytes(buffer.getvalue())
+                    session.add_to_history("assistant", response)
 
             except Exception as e:
-                print(f"Error in handle_transcripts: {e}")
-                if not self.finish_event.is_set():
+                logger.exception("Error in handle_transcripts: %s", e)
+                if not session.finish_event.is_set():
                     await websocket.send_json({
                         'type': 'error',
                         'message': str(e)
                     })
 
     async def process(self, websocket: WebSocket):
+        if await self.refuse_if_full(websocket):
+            return
         await websocket.accept()
+        session = self.create_session()
+        session.speculator = self.create_speculator(
+            lambda user_input: self.get_messages_for_llm(session, user_input), recorder=session.recorder
+        )
 
         try:
-            async with self.stt.create_connection() as connection:
+            async with self.stt.create_connection(session.stt_session) as connection:
                 async with asyncio.TaskGroup() as tg:
-                    tg.create_task(self.handle_audio_stream(websocket))
-                    tg.create_task(self.handle_transcripts(websocket))
+                    tg.create_task(self.handle_audio_stream(websocket, session))
+                    tg.create_task(self.handle_transcripts(websocket, session))
         except* WebSocketDisconnect:
-            print('Client disconnected')
+            logger.info("Client disconnected")
         finally:
-            self.finish_event.set()
+            if session.speculator:
+                session.speculator.reset()
+                logger.info("Speculation stats", extra={'speculation': session.speculator.stats()})
+            self.end_session(session)
             if websocket.client_state != WebSocketState.DISCONNECTED:
-                await websocket.close()
-            await self.cleanup()
\ No newline at end of file
+                await websocket.close()
\ No newline at end of file
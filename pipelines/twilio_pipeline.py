@@ -1,113 +1,318 @@
-import json
-import base64
 import asyncio
+import logging
 import time
+from typing import Optional
+import orjson
 from fastapi import WebSocket
 from fastapi.websockets import WebSocketDisconnect
 from .base import BasePipeline
-from services.stream_manager import StreamManager
+from providers.tts.base import MULAW_8K, PCM16_8K
 from services.audio_handler import AudioHandler
+from services.inbound import FrameAggregator
+from services.pacer import AudioPacer
+from services.recorder import INBOUND_AUDIO, INBOUND_EVENT, STT_EVENT
+from services.session import CallSession
+from services.speech_stream import SegmentAudio
+from services.vad import SilenceGate, VoiceActivityDetector
+from utils.audio import decode_media_payload, ulaw_to_samples
+
+logger = logging.getLogger(__name__)
 
 
 class TwilioPipeline(BasePipeline):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.stream_manager = StreamManager(self.tts)
         self.audio_handler = AudioHandler()
-        self.chunk_size = self.config.pipeline_config.chunk_size
+        # Ask the provider for Twilio's wire format so audio needs no transcoding
+        self.audio_format = self.tts.negotiate_format([MULAW_8K, PCM16_8K])
 
-    async def process_sentence(self, sentence: str, websocket: WebSocket, stream_sid: str):
-        try:
-            audio = await self.stream_manager.text_to_speech(sentence)
-            chunks = [audio[i:i + self.chunk_size] for i in range(0, len(audio), self.chunk_size)]
+    async def process_sentence(self, segment: SegmentAudio, websocket: WebSocket, session: CallSession):
+        stream_manager = session.stream_manager
+        pacer = session.pacer
+        fmt = segment.format
+        played = session.playback.add_segment(segment.text)
 
-            for chunk in chunks:
-                if self.stream_manager.should_interrupt:
-                    return False
-                success, _ = await self.audio_handler.send_audio_chunk(
-                    websocket, stream_sid, chunk, self.stream_manager.should_interrupt
-                )
-                if not success:
+        async def started():
+            # Its first frame plays once everything sent before it has
+            played.started_at = max(time.monotonic(), pacer.play_until)
+
+        async def sent():
+            played.sent = True
+            await self.audio_handler.send_mark(websocket, session.stream_sid, played.name)
+
+        try:
+            # Queue audio as it streams in, the pacer sends it out in real time
+            async for data in segment.chunks():
+                if stream_manager.should_interrupt:
+                    pacer.flush()
                     return False
-                await asyncio.sleep(0.05)
-            return True
+                if fmt != MULAW_8K:
+                    data = await self.executor.transform(
+                        self.audio_handler.to_mulaw, data, fmt.sample_rate, fmt.channels
+                    )
+                if not played.audio_ms:
+                    pacer.call(started)
+                pacer.push(data)
+                played.audio_ms += len(data) / MULAW_8K.bytes_per_ms()
+            pacer.end_utterance()
+            pacer.call(sent)
+            await pacer.drain()
+            return not stream_manager.should_interrupt
         except asyncio.CancelledError:
+            pacer.flush()
             return False
 
+    def create_pacer(self, websocket: WebSocket, session: CallSession) -> AudioPacer:
+        async def send_frame(frame: bytes):
+            await self.audio_handler.send_mulaw_chunk(websocket, session.stream_sid, frame, False)
+            if session.reply_turn:
+                session.reply_turn.mark("first_frame_sent")
+                session.reply_turn.mark("last_frame_sent")
+
+        pipeline_config = self.config.pipeline_config
+        return AudioPacer(
+            send_frame,
+            frame_ms=pipeline_config.frame_ms,
+            lead_ms=pipeline_config.pacer_lead_ms,
+            bytes_per_ms=MULAW_8K.bytes_per_ms()
+        )
+
     async def process(self, websocket: WebSocket):
+        if await self.refuse_if_full(websocket):
+            return
         await websocket.accept()
-        stream_sid = None
+        session = self.create_session()
+        session.pacer = self.create_pacer(websocket, session)
+        session.pacer.start()
+
+        pipeline_config = self.config.pipeline_config
+        if pipeline_config.vad_enabled:
+            session.vad = VoiceActivityDetector(
+                threshold_db=pipeline_config.vad_threshold_db,
+                end_ms=pipeline_config.vad_end_ms,
+                frame_ms=pipeline_config.frame_ms
+            )
+            session.silence_gate = SilenceGate(
+                hold_ms=pipeline_config.silence_hold_ms, frame_ms=pipeline_config.frame_ms
+            )
+        session.speculator = self.create_speculator(
+            lambda text: self.build_messages(text, session), self.audio_format, session.recorder
+        )
+
+        try:
+            await self.run_session(websocket, session)
+        finally:
+            if session.turn_task:
+                session.turn_task.cancel()
+            await session.pacer.stop()
+            logger.info("Pacer stats", extra={'pacer': session.pacer.stats(), 'barge_ins': session.playback.barge_ins})
+            if session.silence_gate:
+                gate = session.silence_gate
+                logger.info("Silence gate stats", extra={
+                    'stt_frames_forwarded': gate.frames_forwarded, 'stt_frames_suppressed': gate.frames_suppressed
+                })
+            if session.speculator:
+                session.speculator.reset()
+                logger.info("Speculation stats", extra={'speculation': session.speculator.stats()})
+            self.end_session(session)
+
+    def turn_ended(self, session: CallSession) -> bool:
+        if session.vad:
+            # Decided locally from the inbound audio clock, not from STT message timing
+            vad = session.vad
+            if vad.in_speech or vad.silence_ms < vad.end_ms:
+                return False
+            # STT endpoints later than the VAD; a reply shouldn't start without the last words
+            return not session.stream_manager.unfinalized \
+                or vad.silence_ms >= vad.end_ms + self.config.pipeline_config.final_wait_ms
+        return time.time() - session.stream_manager.last_speech_time > self.config.pipeline_config.speech_timeout
+
+    def maybe_respond(self, websocket: WebSocket, session: CallSession):
+        stream_manager = session.stream_manager
+        if stream_manager.current_transcript and not stream_manager.processing and self.turn_ended(session):
+            stream_manager.processing = True
+            logger.info("Responding", extra={'transcript': stream_manager.current_transcript})
+            stream_manager.unfinalized = ""
+            session.start_reply()
+            session.turn_task = asyncio.create_task(self.respond(websocket, session))
+
+    async def barge_in(self, websocket: WebSocket, session: CallSession):
+        """The caller spoke over the reply: stop its audio at once and keep only what they heard"""
+        playback = session.playback
+        if not self.config.pipeline_config.barge_in_enabled or not playback.playing:
+            return
+        playback.interrupt()
+        dropped_ms = session.pacer.flush()
+        # Twilio would otherwise play out the audio it already holds
+        await self.audio_handler.send_clear(websocket, session.stream_sid)
+        stream_manager = session.stream_manager
+        stream_manager.should_interrupt = True
+        if stream_manager.current_response_task:
+            stream_manager.current_response_task.cancel()
+        logger.info("Barge-in", extra={'heard': playback.heard_text(), 'dropped_ms': dropped_ms})
+
+    def build_messages(self, user_input: str, session: Optional[CallSession] = None):
+        prompts = self.prompts.get_formatted_prompts(user_input=user_input)
+        history = session.message_history if session else []
+        return [
+            {"role": "system", "content": prompts["system_prompt"]},
+            *history,
+            {"role": "user", "content": prompts["user_prompt"]}
+        ]
+
+    async def respond(self, websocket: WebSocket, session: CallSession):
+        stream_manager = session.stream_manager
+
+        async def process_response():
+            user_input = stream_manager.current_transcript
+            session.playback.start_reply()
+            try:
+                messages = self.build_messages(user_input, session)
+                # Reuse generation already running for this transcript, if any
+                run = session.speculator.commit(stream_manager.current_transcript) if session.speculator else None
+
+                reply = self.stream_reply(messages, self.audio_format, run, session.reply_turn, session.recorder)
+                try:
+                    async for segment in reply:
+                        logger.info("Assistant segment", extra={'text': segment.text})
+                        stream_manager.current_tts_task = asyncio.create_task(
+                            self.process_sentence(segment, websocket, session)
+                        )
+                        if not await stream_manager.current_tts_task:
+                            break
+                finally:
+                    await reply.aclose()
+
+            except asyncio.CancelledError:
+                logger.info("Response interrupted by new input")
+            finally:
+                session.playback.finish_reply()
+                # Only what was actually played, a barged-in reply is cut where the caller spoke
+                session.add_to_history("user", user_input)
+                heard = session.playback.heard_text()
+                if heard:
+                    session.add_to_history("assistant", heard)
+                # Finals that arrived while replying weren't part of this turn, keep them for the next
+                remainder = stream_manager.current_transcript
+                if remainder.startswith(user_input):
+                    remainder = remainder[len(user_input):].strip()
+                stream_manager.current_transcript = remainder
+                stream_manager.processing = False
+                if session.reply_turn:
+                    logger.info("Turn timings", extra={'timings': session.reply_turn.offsets()})
+                session.finish_reply()
+
+        async with stream_manager.response_context():
+            stream_manager.current_response_task = asyncio.create_task(process_response())
+            await stream_manager.current_response_task
+        # Speech finalized while replying opens the next turn, which may have ended already
+        self.maybe_respond(websocket, session)
+
+    async def run_session(self, websocket: WebSocket, session: CallSession):
+        stream_manager = session.stream_manager
+        keepalive_s = self.config.pipeline_config.stt_keepalive_s
+        aggregator = FrameAggregator(self.config.pipeline_config.stt_batch_ms)
+
+        async with self.stt.create_connection(session.stt_session) as stt_ws:
+            last_sent = time.monotonic()
+
+            async def forward(packet):
+                nonlocal last_sent
+                if packet:
+                    await stt_ws.send(packet)
+                    last_sent = time.monotonic()
 
-        async with self.stt.create_connection() as stt_ws:
             async def receive_audio():
-                nonlocal stream_sid
+                nonlocal last_sent
                 try:
                     async for message in websocket.iter_text():
-                        data = json.loads(message)
+                        data = orjson.loads(message)
+                        if session.recorder and data['event'] != 'media':
+                            session.recorder.write_json(INBOUND_EVENT, data)
+
                         if data['event'] == 'media':
-                            audio = base64.b64decode(data['media']['payload'])
-                            await stt_ws.send(audio)
+                            audio = decode_media_payload(data['media']['payload'])
+                            if session.recorder:
+                                session.recorder.write(INBOUND_AUDIO, audio)
+                            if not session.vad:
+                                await forward(aggregator.add(audio))
+                                continue
+
+                            event = session.vad.process(ulaw_to_samples(audio))
+                            if event == "speech_start":
+                                await self.barge_in(websocket, session)
+                            speech_end = event == "speech_end"
+                            if speech_end:
+                                session.turn.mark("speech_end")
+                            if speech_end or stream_manager.unfinalized:
+                                # Also polled while the turn waits on a final, see turn_ended
+                                self.maybe_respond(websocket, session)
+                            frames = session.silence_gate.filter(audio, session.vad)
+                            for frame in frames:
+                                await forward(aggregator.add(frame))
+                            if speech_end or not frames:
+                                # Turn boundary or held-back silence, STT should not wait on a partial batch
+                                await forward(aggregator.flush())
+                            if not frames and time.monotonic() - last_sent >= keepalive_s:
+                                await self.stt.keep_alive(session.stt_session)
+                                last_sent = time.monotonic()
+                        elif data['event'] == 'mark':
+                            session.playback.acknowledge(data['mark']['name'])
                         elif data['event'] == 'start':
-                            stream_sid = data['start']['streamSid']
-                            print(f"Stream started: {stream_sid}")
+                            session.stream_sid = data['start']['streamSid']
+                            logger.info("Stream started", extra={'stream_sid': session.stream_sid})
+                        elif data['event'] == 'stop':
+                            await forward(aggregator.flush())
+                            break
                 except WebSocketDisconnect:
-                    if stt_ws.open:
-                        await stt_ws.close()
+                    pass
+                logger.info("STT packets", extra={'stt_packets': aggregator.stats()})
 
             async def handle_responses():
-                async for message in stt_ws:
-                    transcript_data = await self.stt.process_transcript(message)
-                    transcript = transcript_data['transcript']
+                while True:
+                    transcript_data = await self.stt.get_transcript(session.stt_session)
+                    if session.recorder:
+                        session.recorder.write_json(STT_EVENT, transcript_data)
+                    transcript = transcript_data['content']
                     is_final = transcript_data['is_final']
 
                     if transcript:
-                        self.stream_manager.last_speech_time = time.time()
+                        stream_manager.last_speech_time = time.time()
+                        if not session.vad:
+                            # Without local VAD the last transcribed speech stands in for end of speech
+                            session.turn.mark("speech_end")
 
                         if is_final:
-                            if not self.stream_manager.current_transcript:
-                                self.stream_manager.current_transcript = transcript
+                            session.turn.mark("final_transcript")
+                            stream_manager.unfinalized = ""
+                            if not stream_manager.current_transcript:
+                                stream_manager.current_transcript = transcript
                             else:
                                 words = transcript.split()
-                                current_words = self.stream_manager.current_transcript.split()
+                                current_words = stream_manager.current_transcript.split()
                                 if len(words) > 0 and words != current_words[-len(words):]:
-                                    self.stream_manager.current_transcript += " " + transcript
+                                    stream_manager.current_transcript += " " + transcript
 
-                            print(f"\rUser: {self.stream_manager.current_transcript}", end='', flush=True)
+                            logger.info("User transcript", extra={'transcript': stream_manager.current_transcript})
+                            hypothesis = stream_manager.current_transcript
                         else:
-                            print(f"\rUser (typing...): {transcript}", end='', flush=True)
-
-                    if (
-                            time.time() - self.stream_manager.last_speech_time > self.config.pipeline_config.speech_timeout and
-                            self.stream_manager.current_transcript and not self.stream_manager.processing):
-                        self.stream_manager.processing = True
-                        print(f"\nProcessing: {self.stream_manager.current_transcript}")
-
-                        async def process_response():
-                            try:
-                                prompts = self.prompts.get_formatted_prompts(
-                                    user_input=self.stream_manager.current_transcript
-                                )
-                                messages = [
-                                    {"role": "system", "content": prompts["system_prompt"]},
-                                    {"role": "user", "content": prompts["user_prompt"]}
-                                ]
-
-                                ai_response = await self.llm.generate_response(messages)
-                                print(f"\nAssistant: {ai_response}")
-
-                                self.stream_manager.current_tts_task = asyncio.create_task(
-                                    self.process_sentence(ai_response, websocket, stream_sid)
-                                )
-                                await self.stream_manager.current_tts_task
-
-                            except asyncio.CancelledError:
-                                print("\nResponse interrupted by new input")
-                            finally:
-                                self.stream_manager.current_transcript = ""
-                                self.stream_manager.processing = False
-
-                        async with self.stream_manager.response_context():
-                            self.stream_manager.current_response_task = asyncio.create_task(process_response())
-                            await self.stream_manager.current_response_task
-
-            await asyncio.gather(receive_audio(), handle_responses())
+                            # Several a second per call, sampled at DEBUG
+                            logger.debug("Interim transcript", extra={'transcript': transcript})
+                            stream_manager.unfinalized = transcript
+                            if not session.vad:
+                                await self.barge_in(websocket, session)
+                            hypothesis = f"{stream_manager.current_transcript} {transcript}"
+
+                        if session.speculator and not stream_manager.processing:
+                            session.speculator.observe(hypothesis)
+
+                    self.maybe_respond(websocket, session)
+
+            # Transcripts and the reply stop mattering once the caller hangs up
+            responses = asyncio.create_task(handle_responses())
+            try:
+                await receive_audio()
+            finally:
+                responses.cancel()
+                if session.turn_task:
+                    session.turn_task.cancel()
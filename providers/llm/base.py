@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List
+from typing import Dict, Any, List, AsyncIterator
 
 from config.base_config import ProviderConfig
 
@@ -9,9 +9,16 @@ class BaseLLMProvider(ABC):
         self.config = config
 
     @abstractmethod
+    def stream_response(self, messages: List[Dict[str, str]], **kwargs) -> AsyncIterator[str]:
+        """Stream response tokens from messages as they arrive"""
+        pass
+
     async def generate_response(self, messages: List[Dict[str, str]], **kwargs) -> str:
         """Generate response from messages"""
-        pass
+        parts = []
+        async for token in self.stream_response(messages, **kwargs):
+            parts.append(token)
+        return ''.join(parts)
 
     async def cleanup(self):
         """Cleanup resources"""
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple, Union
+
+from config.prompts.base_prompts import PromptTemplate
+from utils.store import MmapSegmentStore
+from utils.text import normalize_text
+from .base import BaseLLMProvider
+
+logger = logging.getLogger(__name__)
+
+
+def _system_prompts(templates: Optional[Iterable[Union[str, PromptTemplate]]]) -> Optional[set]:
+    if templates is None:
+        return None
+    return {t.system_prompt if isinstance(t, PromptTemplate) else t for t in templates}
+
+
+class CachedLLMProvider(BaseLLMProvider):
+    """Caches replies keyed on the conversation context, model and temperature"""
+
+    def __init__(
+        self,
+        provider: BaseLLMProvider,
+        ttl: float = 3600,
+        max_entries: int = 1000,
+        normalize: bool = True,
+        include_templates: Optional[Iterable[Union[str, PromptTemplate]]] = None,
+        exclude_templates: Optional[Iterable[Union[str, PromptTemplate]]] = None,
+        shared_dir: Optional[str] = None,
+        shared_bytes: int = 64 * 1024 * 1024
+    ):
+        super().__init__(provider.config)
+        self.provider = provider
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.normalize = normalize  # also match on normalized text, not just exact text
+        self.include_templates = _system_prompts(include_templates)
+        self.exclude_templates = _system_prompts(exclude_templates) or set()
+        self.entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        # Replies other workers on the host have already generated
+        self.shared = MmapSegmentStore(shared_dir, shared_bytes) if shared_dir else None
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    def cacheable(self, messages: List[Dict[str, str]]) -> bool:
+        system_prompt = next((m["content"] for m in messages if m["role"] == "system"), None)
+        if system_prompt in self.exclude_templates:
+            return False
+        return self.include_templates is None or system_prompt in self.include_templates
+
+    def cache_keys(self, messages: List[Dict[str, str]], temperature: float) -> List[str]:
+        keys = []
+        variants = [lambda text: text]
+        if self.normalize:
+            variants.append(normalize_text)
+        for variant in variants:
+            context = [[m["role"], variant(m["content"])] for m in messages]
+            raw = json.dumps([self.config.model, temperature, context])
+            keys.append(hashlib.sha256(raw.encode()).hexdigest())
+        return keys
+
+    def get(self, keys: List[str]) -> Optional[str]:
+        now = time.monotonic()
+        for key in keys:
+            entry = self.entries.get(key)
+            if entry is None:
+                continue
+            expires_at, response = entry
+            if expires_at < now:
+                del self.entries[key]
+                continue
+            self.entries.move_to_end(key)
+            return response
+        return None
+
+    async def get_shared(self, keys: List[str]) -> Optional[str]:
+        for key in keys:
+            data = await self.shared.get(key)
+            if data is None:
+                continue
+            # Wall clock, the expiry has to mean the same thing in every worker
+            entry = json.loads(bytes(data))
+            remaining = entry["expires_at"] - time.time()
+            if remaining <= 0:
+                self.shared.discard(key)  # so a fresher reply written later is mapped anew
+                continue
+            # Expires here when it does in the store, a local copy doesn't get a fresh ttl
+            self.put(keys, entry["response"], ttl=remaining)
+            return entry["response"]
+        return None
+
+    def put(self, keys: List[str], response: str, ttl: Optional[float] = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        for key in keys:
+            self.entries[key] = (expires_at, response)
+            self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    async def put_shared(self, keys: List[str], response: str):
+        entry = json.dumps({"expires_at": time.time() + self.ttl, "response": response}).encode()
+        try:
+            for key in keys:
+                await self.shared.put(key, entry)
+        except OSError as e:
+            logger.warning("Error writing shared LLM cache: %s", e)
+
+    async def stream_response(self, messages: List[Dict[str, str]], **kwargs) -> AsyncIterator[str]:
+        if not self.cacheable(messages):
+            self.bypassed += 1
+            async for token in self.provider.stream_response(messages, **kwargs):
+                yield token
+            return
+
+        keys = self.cache_keys(messages, kwargs.get('temperature', 0.7))
+        response = self.get(keys)
+        if response is None and self.shared:
+            response = await self.get_shared(keys)
+            if response is not None:
+                self.shared_hits += 1
+        if response is not None:
+            self.hits += 1
+            yield response
+            return
+
+        self.misses += 1
+        tokens = []
+        async for token in self.provider.stream_response(messages, **kwargs):
+            tokens.append(token)
+            yield token
+        # Only complete replies are stored
+        if tokens:
+            response = ''.join(tokens)
+            self.put(keys, response)
+            if self.shared:
+                await self.put_shared(keys, response)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'bypassed': self.bypassed,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'entries': len(self.entries)
+        }
+
+    async def cleanup(self):
+        await self.provider.cleanup()
@@ -1,16 +1,39 @@
 from groq import AsyncGroq
-from typing import List, Dict
+from typing import List, Dict, AsyncIterator, Optional
+from utils.http import http_pool
 from .base import BaseLLMProvider
 
+GROQ_BASE_URL = "https://api.groq.com"
+
+
 class GroqLLM(BaseLLMProvider):
     def __init__(self, config):
         super().__init__(config)
-        self.client = AsyncGroq(api_key=config.api_key)
+        self.base_url = config.additional_params.get('base_url', GROQ_BASE_URL)
+        self._client: Optional[AsyncGroq] = None
+        http_pool.register(self.base_url)
+
+    @property
+    def client(self) -> AsyncGroq:
+        # Built on first use so it picks up the pool configured by the app lifespan
+        if self._client is None:
+            self._client = AsyncGroq(
+                api_key=self.config.api_key,
+                base_url=self.base_url,
+                http_client=http_pool.client_for(self.base_url)
+            )
+        return self._client
 
-    async def generate_response(self, messages: List[Dict[str, str]], **kwargs) -> str:
-        response = await self.client.chat.completions.create(
+    async def stream_response(self, messages: List[Dict[str, str]], **kwargs) -> AsyncIterator[str]:
+        stream = await self.client.chat.completions.create(
             model=self.config.model,
             messages=messages,
-            temperature=kwargs.get('temperature', 0.7)
+            temperature=kwargs.get('temperature', 0.7),
+            stream=True
         )
-        return response.choices[0].message.content
\ No newline at end of file
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            token = chunk.choices[0].delta.content
+            if token:
+                yield token
@@ -0,0 +1,65 @@
+import asyncio
+from typing import AsyncIterator, Dict, List
+
+from services.admission import AdmissionScheduler, retry_after
+from .base import BaseLLMProvider
+
+
+def estimate_tokens(messages: List[Dict[str, str]]) -> int:
+    # About four characters per token for English, close enough for a rate budget
+    return sum(len(m["content"]) for m in messages) // 4 + 1
+
+
+class ScheduledLLMProvider(BaseLLMProvider):
+    """Queues requests under the provider's concurrency and token-rate budget instead of letting them fail"""
+
+    def __init__(self, provider: BaseLLMProvider):
+        super().__init__(provider.config)
+        self.provider = provider
+        self.scheduler = AdmissionScheduler(f"llm.{provider.config.provider_name}", provider.config.admission)
+
+    async def _pump(self, messages: List[Dict[str, str]], kwargs: Dict, queue: asyncio.Queue):
+        retries = self.config.admission.retries
+        try:
+            for attempt in range(retries + 1):
+                started = False
+                try:
+                    async with self.scheduler.slot(estimate_tokens(messages)):
+                        # The reply's tokens count against the budget too, estimated the same way once it ends
+                        reply_chars = 0
+                        try:
+                            async for token in self.provider.stream_response(messages, **kwargs):
+                                started = True
+                                reply_chars += len(token)
+                                queue.put_nowait(token)
+                        finally:
+                            self.scheduler.charge(reply_chars // 4)
+                    return
+                except Exception as e:
+                    delay = retry_after(e)
+                    if started or delay is None or attempt == retries:
+                        raise
+                    self.scheduler.backoff(delay)
+        except Exception as e:
+            queue.put_nowait(e)
+        finally:
+            queue.put_nowait(None)
+
+    async def stream_response(self, messages: List[Dict[str, str]], **kwargs) -> AsyncIterator[str]:
+        # The slot covers the provider request only; a consumer that stops pulling while
+        # earlier segments play reads the rest of the reply from the queue
+        queue: asyncio.Queue = asyncio.Queue()
+        pump = asyncio.create_task(self._pump(messages, kwargs, queue))
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            pump.cancel()
+
+    async def cleanup(self):
+        await self.provider.cleanup()
@@ -1,26 +1,49 @@
 # providers/stt/base.py
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from dataclasses import dataclass, field
+from typing import Dict, Any, List
+
+
+@dataclass
+class STTSession:
+    """Per-call transcript state, kept off the shared provider"""
+    transcript_queue: asyncio.Queue = field(default_factory=asyncio.Queue)
+    transcript_parts: List[str] = field(default_factory=list)
+    connection: Any = None
+
 
 class BaseSTTProvider(ABC):
     def __init__(self, config):
         self.config = config
 
+    async def startup(self):
+        """Prepare shared resources once the event loop is running"""
+        pass
+
+    def create_session(self) -> STTSession:
+        """Create per-call transcript state"""
+        return STTSession()
+
     @abstractmethod
-    async def create_connection(self, **kwargs):
+    def create_connection(self, session: STTSession, **kwargs):
         """Create a connection to the STT service"""
         pass
 
     @abstractmethod
-    async def process_audio(self, audio_data: bytes):
+    async def process_audio(self, session: STTSession, audio_data: bytes):
         """Process audio data"""
         pass
 
     @abstractmethod
-    async def get_transcript(self) -> Dict[str, Any]:
+    async def get_transcript(self, session: STTSession) -> Dict[str, Any]:
         """Get transcript from the queue"""
         pass
 
+    async def keep_alive(self, session: STTSession):
+        """Keep an idle connection open while no audio is being sent"""
+        pass
+
     async def cleanup(self):
         """Cleanup resources"""
-        pass
\ No newline at end of file
+        pass
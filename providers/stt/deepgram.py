@@ -2,60 +2,56 @@
 from deepgram import (
     DeepgramClient, DeepgramClientOptions, LiveTranscriptionEvents, LiveOptions
 )
-from typing import Dict, Any, Optional
+from collections import deque
+from typing import Deque, Dict, Any, Optional, Set
 import asyncio
-from .base import BaseSTTProvider
+import logging
+from .base import BaseSTTProvider, STTSession
 
+logger = logging.getLogger(__name__)
 
-class DeepgramConnectionManager:
-    def __init__(self, provider):
-        self.provider = provider
-        self.connection = None
 
-    async def __aenter__(self):
-        options = LiveOptions(
-            model='nova-2',
-            language='en',
-            smart_format=True,
-            interim_results=True,
-            utterance_end_ms='1000',
-            vad_events=True,
-            endpointing=500,
-        )
+class DeepgramLiveConnection:
+    """A live connection whose transcript events go to whichever session currently holds it"""
 
-        self.connection = self.provider.client.listen.asynclive.v('1')
+    def __init__(self, provider):
+        self.provider = provider
+        self.session: Optional[STTSession] = None
+        self.connection = provider.client.listen.asynclive.v('1')
 
         async def on_message(self_handler, result, **kwargs):
+            session = self.session
             sentence = result.channel.alternatives[0].transcript
-            if len(sentence) == 0:
+            if session is None or len(sentence) == 0:
                 return
             if result.is_final:
-                self.provider.transcript_parts.append(sentence)
-                await self.provider.transcript_queue.put({
+                session.transcript_parts.append(sentence)
+                await session.transcript_queue.put({
                     'type': 'transcript_final',
                     'content': sentence,
                     'is_final': True
                 })
                 if result.speech_final:
-                    full_transcript = ' '.join(self.provider.transcript_parts)
-                    self.provider.transcript_parts = []
-                    await self.provider.transcript_queue.put({
+                    full_transcript = ' '.join(session.transcript_parts)
+                    session.transcript_parts = []
+                    await session.transcript_queue.put({
                         'type': 'speech_final',
                         'content': full_transcript,
                         'is_final': True
                     })
             else:
-                await self.provider.transcript_queue.put({
+                await session.transcript_queue.put({
                     'type': 'transcript_interim',
                     'content': sentence,
                     'is_final': False
                 })
 
         async def on_utterance_end(self_handler, utterance_end, **kwargs):
-            if len(self.provider.transcript_parts) > 0:
-                full_transcript = ' '.join(self.provider.transcript_parts)
-                self.provider.transcript_parts = []
-                await self.provider.transcript_queue.put({
+            session = self.session
+            if session is not None and len(session.transcript_parts) > 0:
+                full_transcript = ' '.join(session.transcript_parts)
+                session.transcript_parts = []
+                await session.transcript_queue.put({
                     'type': 'speech_final',
                     'content': full_transcript,
                     'is_final': True
@@ -64,40 +60,168 @@ class DeepgramConnectionManager:
         self.connection.on(LiveTranscriptionEvents.Transcript, on_message)
         self.connection.on(LiveTranscriptionEvents.UtteranceEnd, on_utterance_end)
 
-        if await self.connection.start(options) is False:
+    async def start(self):
+        if await self.connection.start(self.provider.live_options()) is False:
             raise Exception('Failed to connect to Deepgram')
 
-        self.provider.connection = self.connection
-        return self.connection
+    async def finish(self):
+        self.session = None
+        await self.connection.finish()
+
+
+class DeepgramConnectionPool:
+    """Keeps authenticated live connections open so calls skip the handshake"""
+
+    def __init__(self, provider, size: int, keepalive_interval: float = 5.0):
+        self.provider = provider
+        self.size = size
+        self.keepalive_interval = keepalive_interval
+        self.idle: Deque[DeepgramLiveConnection] = deque()
+        self.opening = 0
+        self.hits = 0
+        self.misses = 0
+        self._keepalive_task: Optional[asyncio.Task] = None
+        self._opening_tasks: Set[asyncio.Task] = set()  # referenced so they are not collected mid-handshake
+
+    def start(self):
+        if self._keepalive_task is None:
+            self._keepalive_task = asyncio.create_task(self._keepalive_loop())
+        self.refill()
+
+    def refill(self):
+        for _ in range(self.size - len(self.idle) - self.opening):
+            self.opening += 1
+            task = asyncio.create_task(self._open())
+            self._opening_tasks.add(task)
+            task.add_done_callback(self._opening_tasks.discard)
+
+    async def _open(self):
+        live = DeepgramLiveConnection(self.provider)
+        try:
+            await live.start()
+            self.idle.append(live)
+        except asyncio.CancelledError:
+            # Closing the pool, don't leave a half-open connection behind
+            try:
+                await live.finish()
+            except Exception:
+                pass
+            raise
+        except Exception as e:
+            logger.warning("Error warming Deepgram connection: %s", e)
+        finally:
+            self.opening -= 1
+
+    async def acquire(self) -> DeepgramLiveConnection:
+        if self._keepalive_task is None:
+            self.start()
+        live = self.idle.popleft() if self.idle else None
+        self.refill()
+        if live is not None:
+            self.hits += 1
+            return live
+        # Pool ran dry, pay for the handshake on this call
+        self.misses += 1
+        live = DeepgramLiveConnection(self.provider)
+        await live.start()
+        return live
+
+    async def _keepalive_loop(self):
+        while True:
+            await asyncio.sleep(self.keepalive_interval)
+            for live in list(self.idle):
+                try:
+                    if await live.connection.keep_alive() is False and live in self.idle:
+                        # Dead connection, replace it; acquire() may have taken it meanwhile
+                        self.idle.remove(live)
+                        self.refill()
+                except Exception as e:
+                    logger.warning("Error keeping Deepgram connection alive: %s", e)
+
+    async def close(self):
+        if self._keepalive_task:
+            self._keepalive_task.cancel()
+            self._keepalive_task = None
+        for task in self._opening_tasks:
+            task.cancel()
+        await asyncio.gather(*self._opening_tasks, return_exceptions=True)
+        while self.idle:
+            await self.idle.popleft().finish()
+
+
+class DeepgramConnectionManager:
+    def __init__(self, provider, session: STTSession):
+        self.provider = provider
+        self.session = session
+        self.live: Optional[DeepgramLiveConnection] = None
+
+    async def __aenter__(self):
+        if self.provider.pool:
+            self.live = await self.provider.pool.acquire()
+        else:
+            self.live = DeepgramLiveConnection(self.provider)
+            await self.live.start()
+
+        self.live.session = self.session
+        self.session.connection = self.live.connection
+        return self.live.connection
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.connection:
-            await self.connection.finish()
-            self.provider.connection = None
+        if self.live:
+            await self.live.finish()
+            self.session.connection = None
 
 
 class DeepgramSTT(BaseSTTProvider):
     def __init__(self, config):
         super().__init__(config)
+        # ws:// base URLs (e.g. a local stand-in server) skip TLS
         self.client = DeepgramClient(
             config.api_key,
-            config=DeepgramClientOptions(options={'keepalive': 'true'})
+            config=DeepgramClientOptions(
+                url=config.additional_params.get('base_url', ''),
+                options={'keepalive': 'true'}
+            )
         )
-        self.connection = None
-        self.transcript_queue = asyncio.Queue()
-        self.transcript_parts = []
+        pool_size = config.additional_params.get('pool_size', 0)
+        self.pool = DeepgramConnectionPool(
+            self,
+            pool_size,
+            keepalive_interval=config.additional_params.get('pool_keepalive_interval', 5.0)
+        ) if pool_size else None
+
+    def live_options(self) -> LiveOptions:
+        params = self.config.additional_params
+        return LiveOptions(
+            model='nova-2',
+            encoding=params.get('encoding'),  # raw audio such as Twilio's mulaw needs these two
+            sample_rate=params.get('sample_rate'),
+            language='en',
+            smart_format=True,
+            interim_results=True,
+            utterance_end_ms='1000',
+            vad_events=True,
+            endpointing=500,
+        )
+
+    async def startup(self):
+        if self.pool:
+            self.pool.start()
+
+    def create_connection(self, session: STTSession, **kwargs):
+        return DeepgramConnectionManager(self, session)
 
-    def create_connection(self, **kwargs):
-        return DeepgramConnectionManager(self)
+    async def process_audio(self, session: STTSession, audio_data: bytes):
+        if session.connection:
+            await session.connection.send(audio_data)
 
-    async def process_audio(self, audio_data: bytes):
-        if self.connection:
-            await self.connection.send(audio_data)
+    async def get_transcript(self, session: STTSession) -> Dict[str, Any]:
+        return await session.transcript_queue.get()
 
-    async def get_transcript(self) -> Dict[str, Any]:
-        return await self.transcript_queue.get()
+    async def keep_alive(self, session: STTSession):
+        if session.connection:
+            await session.connection.keep_alive()
 
     async def cleanup(self):
-        if self.connection:
-            await self.connection.finish()
-            self.connection = None
\ No newline at end of file
+        if self.pool:
+            await self.pool.close()
@@ -0,0 +1,39 @@
+from contextlib import asynccontextmanager
+from typing import Any, Dict
+
+from services.admission import AdmissionScheduler
+from .base import BaseSTTProvider, STTSession
+
+
+class ScheduledSTTProvider(BaseSTTProvider):
+    """Limits concurrent streaming connections; a call past the limit waits for one to free up"""
+
+    def __init__(self, provider: BaseSTTProvider):
+        super().__init__(provider.config)
+        self.provider = provider
+        self.scheduler = AdmissionScheduler(f"stt.{provider.config.provider_name}", provider.config.admission)
+
+    async def startup(self):
+        await self.provider.startup()
+
+    def create_session(self) -> STTSession:
+        return self.provider.create_session()
+
+    @asynccontextmanager
+    async def create_connection(self, session: STTSession, **kwargs):
+        # The slot is held for the whole call, connections are what the provider limits
+        async with self.scheduler.slot():
+            async with self.provider.create_connection(session, **kwargs) as connection:
+                yield connection
+
+    async def process_audio(self, session: STTSession, audio_data: bytes):
+        await self.provider.process_audio(session, audio_data)
+
+    async def get_transcript(self, session: STTSession) -> Dict[str, Any]:
+        return await self.provider.get_transcript(session)
+
+    async def keep_alive(self, session: STTSession):
+        await self.provider.keep_alive(session)
+
+    async def cleanup(self):
+        await self.provider.cleanup()
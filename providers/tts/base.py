@@ -1,18 +1,98 @@
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 from pydub import AudioSegment
 
 from config.base_config import ProviderConfig
 
 
+@dataclass(frozen=True)
+class AudioFormat:
+    encoding: str  # "linear16" (signed 16-bit little-endian) or "mulaw"
+    sample_rate: int
+    channels: int = 1
+
+    @property
+    def sample_width(self) -> int:
+        return 2 if self.encoding == "linear16" else 1
+
+    def bytes_per_ms(self) -> float:
+        return self.sample_rate * self.sample_width * self.channels / 1000
+
+    @property
+    def name(self) -> str:
+        return f"{self.encoding}_{self.sample_rate}"
+
+    @classmethod
+    def parse(cls, name: str) -> "AudioFormat":
+        encoding, sample_rate = name.rsplit("_", 1)
+        return cls(encoding, int(sample_rate))
+
+
+PCM16_8K = AudioFormat("linear16", 8000)
+MULAW_8K = AudioFormat("mulaw", 8000)  # Twilio media stream wire format
+
+
 class BaseTTSProvider(ABC):
+    supported_formats: Tuple[AudioFormat, ...] = (PCM16_8K,)
+
     def __init__(self, config: ProviderConfig):
         self.config = config
+        if config.output_format:
+            self.output_format = AudioFormat.parse(config.output_format)
+        else:
+            self.output_format = AudioFormat(
+                "linear16", config.additional_params.get('sample_rate', PCM16_8K.sample_rate)
+            )
+        if self.output_format not in self.supported_formats:
+            raise ValueError(f"{type(self).__name__} does not support {self.output_format.name}")
+
+    def negotiate_format(self, preferred: List[AudioFormat]) -> AudioFormat:
+        """Pick the first preferred format the provider can emit natively"""
+        for fmt in preferred:
+            if fmt in self.supported_formats:
+                return fmt
+        return self.output_format
+
+    def cache_identity(self) -> Dict[str, Any]:
+        """Everything besides text and format that changes the synthesized audio"""
+        return {"provider": self.config.provider_name, "model": self.config.model}
 
     @abstractmethod
+    def stream_speech(self, text: str, audio_format: Optional[AudioFormat] = None) -> AsyncIterator[bytes]:
+        """Stream raw audio as it arrives from the provider, in output_format unless told otherwise"""
+        pass
+
     async def text_to_speech(self, text: str) -> AudioSegment:
         """Convert text to speech"""
-        pass
+        fmt = AudioFormat("linear16", self.output_format.sample_rate, self.output_format.channels)
+        chunks = []
+        async for chunk in self.stream_speech(text, fmt):
+            chunks.append(chunk)
+        return AudioSegment(
+            data=b''.join(chunks),
+            sample_width=fmt.sample_width,
+            frame_rate=fmt.sample_rate,
+            channels=fmt.channels
+        )
 
     async def cleanup(self):
         """Cleanup resources"""
         pass
+
+
+async def iter_audio(response, fmt: AudioFormat) -> AsyncIterator[bytes]:
+    """Yield a streaming HTTP body in whole samples, without waiting for the full clip"""
+    if response.status_code != 200:
+        await response.aread()
+        response.raise_for_status()
+
+    frame = fmt.sample_width * fmt.channels
+    remainder = b''
+    async for data in response.aiter_bytes():
+        if remainder:
+            data = remainder + data
+        cut = len(data) - len(data) % frame
+        remainder = data[cut:]
+        if cut:
+            yield data[:cut]
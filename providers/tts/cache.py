@@ -0,0 +1,118 @@
+import hashlib
+import json
+import logging
+import re
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Optional
+
+from utils.store import MmapSegmentStore
+from .base import AudioFormat, BaseTTSProvider
+
+logger = logging.getLogger(__name__)
+
+CHUNK_BYTES = 4096
+
+
+class MemoryLRU:
+    """Byte-bounded in-memory LRU of synthesized audio"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries: "OrderedDict[str, bytes]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[bytes]:
+        data = self.entries.get(key)
+        if data is not None:
+            self.entries.move_to_end(key)
+        return data
+
+    def put(self, key: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.size -= len(old)
+        self.entries[key] = data
+        self.size += len(data)
+        while self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+
+
+class CachedTTSProvider(BaseTTSProvider):
+    """Caches synthesized audio per provider, voice, model, settings, format and text"""
+
+    def __init__(
+        self,
+        provider: BaseTTSProvider,
+        memory_bytes: int = 64 * 1024 * 1024,
+        cache_dir: Optional[str] = None,
+        disk_bytes: int = 1024 * 1024 * 1024
+    ):
+        self.provider = provider
+        self.config = provider.config
+        self.supported_formats = provider.supported_formats
+        self.output_format = provider.output_format
+        self.memory = MemoryLRU(memory_bytes)
+        self.disk = MmapSegmentStore(cache_dir, disk_bytes) if cache_dir else None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def cache_identity(self) -> Dict[str, Any]:
+        return self.provider.cache_identity()
+
+    def cache_key(self, text: str, fmt: AudioFormat) -> str:
+        identity = dict(self.cache_identity(), format=fmt.name, text=re.sub(r'\s+', ' ', text).strip())
+        return hashlib.sha256(json.dumps(identity, sort_keys=True).encode()).hexdigest()
+
+    async def stream_speech(self, text: str, audio_format: Optional[AudioFormat] = None) -> AsyncIterator[bytes]:
+        fmt = audio_format or self.output_format
+        key = self.cache_key(text, fmt)
+
+        data = self.memory.get(key)
+        if data is not None:
+            self.memory_hits += 1
+        elif self.disk:
+            data = await self.disk.get(key)
+            if data is not None:
+                self.disk_hits += 1
+                # Hot entries are served from memory from now on
+                data = bytes(data)
+                self.memory.put(key, data)
+        if data is not None:
+            for i in range(0, len(data), CHUNK_BYTES):
+                yield data[i:i + CHUNK_BYTES]
+            return
+
+        self.misses += 1
+        chunks = []
+        stream = self.provider.stream_speech(text, fmt)
+        async for chunk in stream:
+            chunks.append(chunk)
+            yield chunk
+        # Only complete clips are stored, an interrupted stream leaves no entry
+        data = b''.join(chunks)
+        # A wrapped provider can mark a stream as not to be kept, see HedgedStream
+        if data and getattr(stream, 'cacheable', True):
+            self.memory.put(key, data)
+            if self.disk:
+                try:
+                    await self.disk.put(key, data)
+                except OSError as e:
+                    logger.warning("Error writing TTS cache: %s", e)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+            'memory_bytes': self.memory.size,
+            'memory_entries': len(self.memory.entries)
+        }
+
+    async def cleanup(self):
+        await self.provider.cleanup()
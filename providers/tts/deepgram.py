@@ -1,30 +1,42 @@
-import httpx
-from pydub import AudioSegment
-import io
-from .base import BaseTTSProvider
+from typing import Any, AsyncIterator, Dict, Optional
+from utils.http import http_pool
+from .base import AudioFormat, BaseTTSProvider, MULAW_8K, iter_audio
 
 
 class DeepgramTTS(BaseTTSProvider):
+    supported_formats = tuple(
+        AudioFormat("linear16", rate) for rate in (8000, 16000, 24000, 32000, 48000)
+    ) + (MULAW_8K, AudioFormat("mulaw", 16000))
+
     def __init__(self, config):
         super().__init__(config)
-        self.client = httpx.AsyncClient()
-        self.url = 'https://api.deepgram.com/v1/speak?model=aura-luna-en'
+        base_url = config.additional_params.get('base_url', 'https://api.deepgram.com')
+        self.url = f"{base_url}/v1/speak"
+        self.model = config.model or 'aura-luna-en'
+        http_pool.register(self.url)
+
+    def cache_identity(self) -> Dict[str, Any]:
+        return {"provider": "deepgram", "model": self.model}
 
-    async def text_to_speech(self, text: str) -> AudioSegment:
+    async def stream_speech(self, text: str, audio_format: Optional[AudioFormat] = None) -> AsyncIterator[bytes]:
+        fmt = audio_format or self.output_format
         headers = {
             'Authorization': f'Token {self.config.api_key}',
             'Content-Type': 'application/json'
         }
+        params = {
+            'model': self.model,
+            'encoding': fmt.encoding,
+            'sample_rate': fmt.sample_rate,
+            'container': 'none'
+        }
 
-        async with self.client.stream(
+        async with http_pool.client_for(self.url).stream(
                 'POST',
                 self.url,
                 headers=headers,
+                params=params,
                 json={'text': text}
         ) as res:
-            audio_data = await res.aread()
-            audio = AudioSegment.from_mp3(io.BytesIO(audio_data))
-            return audio.set_frame_rate(8000).set_channels(1)
-
-    async def cleanup(self):
-        await self.client.aclose()
\ No newline at end of file
+            async for chunk in iter_audio(res, fmt):
+                yield chunk
@@ -1,44 +1,58 @@
-import httpx
-from pydub import AudioSegment
-import io
-from .base import BaseTTSProvider
+from typing import Any, AsyncIterator, Dict, Optional
+from utils.http import http_pool
+from .base import AudioFormat, BaseTTSProvider, MULAW_8K, iter_audio
+
+
+ENCODING_NAMES = {"linear16": "pcm", "mulaw": "ulaw"}
 
 
 class ElevenLabsTTS(BaseTTSProvider):
+    supported_formats = tuple(
+        AudioFormat("linear16", rate) for rate in (8000, 16000, 22050, 24000, 44100)
+    ) + (MULAW_8K,)
+
     def __init__(self, config):
         super().__init__(config)
-        self.client = httpx.AsyncClient()
         self.voice_id = config.additional_params.get('voice_id', 'default')
-        self.url = f"https://api.elevenlabs.io/v1/text-to-speech/{self.voice_id}/stream"
+        self.model_id = config.model or "eleven_turbo_v2_5"
+        self.voice_settings = config.additional_params.get('voice_settings', {
+            "stability": 0.5,
+            "similarity_boost": 0.75,
+            "style": 0.5,
+            "use_speaker_boost": True
+        })
+        base_url = config.additional_params.get('base_url', 'https://api.elevenlabs.io')
+        self.url = f"{base_url}/v1/text-to-speech/{self.voice_id}/stream"
+        http_pool.register(self.url)
 
-    async def text_to_speech(self, text: str) -> AudioSegment:
+    def cache_identity(self) -> Dict[str, Any]:
+        return {
+            "provider": "elevenlabs",
+            "voice_id": self.voice_id,
+            "model": self.model_id,
+            "voice_settings": self.voice_settings
+        }
+
+    async def stream_speech(self, text: str, audio_format: Optional[AudioFormat] = None) -> AsyncIterator[bytes]:
+        fmt = audio_format or self.output_format
         headers = {
-            "Accept": "audio/mpeg",
             "Content-Type": "application/json",
             "xi-api-key": self.config.api_key
         }
 
         data = {
             "text": text,
-            "model_id": "eleven_turbo_v2_5",
-            "voice_settings": {
-                "stability": 0.5,
-                "similarity_boost": 0.75,
-                "style": 0.5,
-                "use_speaker_boost": True
-            },
+            "model_id": self.model_id,
+            "voice_settings": self.voice_settings,
             "optimize_streaming_latency": 4
         }
 
-        async with self.client.stream(
+        async with http_pool.client_for(self.url).stream(
                 'POST',
                 self.url,
                 headers=headers,
+                params={"output_format": f"{ENCODING_NAMES[fmt.encoding]}_{fmt.sample_rate}"},
                 json=data
         ) as res:
-            audio_data = await res.aread()
-            audio = AudioSegment.from_mp3(io.BytesIO(audio_data))
-            return audio.set_frame_rate(8000).set_channels(1)
-
-    async def cleanup(self):
-        await self.client.aclose()
\ No newline at end of file
+            async for chunk in iter_audio(res, fmt):
+                yield chunk
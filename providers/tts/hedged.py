@@ -0,0 +1,263 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from config.base_config import HedgeConfig
+from .base import AudioFormat, BaseTTSProvider
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyStats:
+    """Recent time-to-first-audio samples and error counts for one provider
+
+    A request cancelled before its first audio, e.g. a slow primary that lost the hedge,
+    only tells us its time was longer than it ran. Those are kept as censored samples and
+    percentiles use the Kaplan-Meier estimate; dropping them would bias the tail low and
+    hedge more often than the percentile asks for.
+    """
+
+    def __init__(self, window: int = 200):
+        self.samples: Deque[Tuple[float, bool]] = deque(maxlen=window)  # (seconds, audio arrived)
+        self.requests = 0
+        self.errors = 0
+        self.wins = 0
+
+    def observe(self, seconds: float):
+        self.samples.append((seconds, True))
+
+    def censor(self, seconds: float):
+        self.samples.append((seconds, False))
+
+    def percentile(self, q: float) -> Optional[float]:
+        """None when the censored samples leave the percentile unknown, i.e. beyond the longest wait"""
+        at_risk = len(self.samples)
+        survival = 1.0
+        # Observed times sort ahead of equal censored ones, the usual convention
+        for seconds, observed in sorted(self.samples, key=lambda sample: (sample[0], not sample[1])):
+            if observed:
+                survival *= 1 - 1 / at_risk
+                if 1 - survival >= q:
+                    return seconds
+            at_risk -= 1
+        return None
+
+    def summary(self) -> Dict[str, Any]:
+        def ms(q):
+            value = self.percentile(q)
+            return round(value * 1000, 1) if value is not None else None
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'wins': self.wins,
+            'ttfa_p50_ms': ms(0.5),
+            'ttfa_p95_ms': ms(0.95),
+            'ttfa_p99_ms': ms(0.99)
+        }
+
+
+class _Attempt:
+    """One provider's synthesis of the text, running in its own task so the loser can be cancelled cleanly
+
+    Latency counts from admission: a ScheduledStream's admitted future says when the
+    request left our own queue, other providers are admitted at once.
+    """
+
+    def __init__(self, index: int, provider: BaseTTSProvider, stats: LatencyStats, text: str, fmt: AudioFormat):
+        self.index = index
+        self.provider = provider
+        self.stats = stats
+        loop = asyncio.get_running_loop()
+        self.first: asyncio.Future = loop.create_future()
+        self.queue: asyncio.Queue = asyncio.Queue()  # chunks after the first, an exception, then None
+        stats.requests += 1
+        self.started = time.monotonic()
+        stream = provider.stream_speech(text, fmt)
+        admitted = getattr(stream, 'admitted', None)
+        if admitted is None:
+            admitted = loop.create_future()
+            admitted.set_result(self.started)
+        self.admitted: asyncio.Future = admitted
+        self.task = asyncio.create_task(self._run(stream))
+
+    async def _run(self, stream: AsyncIterator[bytes]):
+        try:
+            async for chunk in stream:
+                if not chunk:
+                    continue
+                if self.first.done():
+                    self.queue.put_nowait(chunk)
+                else:
+                    self.stats.observe(time.monotonic() - self.admitted.result())
+                    self.first.set_result(chunk)
+            if not self.first.done():
+                raise RuntimeError(f"{self.provider.config.provider_name} returned no audio")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.stats.errors += 1
+            if self.first.done():
+                self.queue.put_nowait(e)
+            else:
+                self.first.set_exception(e)
+        finally:
+            self.queue.put_nowait(None)
+
+    def cancel(self):
+        self.task.cancel()
+        if not self.first.done():
+            if self.admitted.done():  # still queued says nothing about the provider
+                self.stats.censor(time.monotonic() - self.admitted.result())
+            self.first.cancel()
+        elif not self.first.cancelled():
+            self.first.exception()  # a loser's error is expected, don't report it as never retrieved
+
+
+class HedgedTTSProvider(BaseTTSProvider):
+    """Sends each segment to the first provider, and to the next one as well if no audio arrives in time
+
+    The hedge deadline is a percentile of the provider's recent time to first audio, so
+    only its slowest responses get a second request. Whichever provider streams first
+    is played and the other request is cancelled. An error before any audio fails over
+    to the next provider straight away.
+    """
+
+    def __init__(self, providers: List[BaseTTSProvider], config: Optional[HedgeConfig] = None):
+        self.providers = providers
+        primary = providers[0]
+        self.config = primary.config
+        # Hedged requests must return the same audio format, only formats every provider emits qualify
+        self.supported_formats = tuple(
+            fmt for fmt in primary.supported_formats
+            if all(fmt in provider.supported_formats for provider in providers[1:])
+        )
+        if not self.supported_formats:
+            raise ValueError("Hedged TTS providers share no output format")
+        self.output_format = primary.output_format if primary.output_format in self.supported_formats \
+            else self.supported_formats[0]
+        self.hedge = config or HedgeConfig()
+        self.latency = [LatencyStats(self.hedge.window) for _ in providers]
+        self.hedges = 0
+        self.failovers = 0
+
+    def cache_identity(self) -> Dict[str, Any]:
+        return {"provider": "hedged", "providers": [provider.cache_identity() for provider in self.providers]}
+
+    def deadline(self, index: int) -> float:
+        stats = self.latency[index]
+        if len(stats.samples) < self.hedge.min_samples:
+            return self.hedge.default_deadline
+        value = stats.percentile(self.hedge.percentile)
+        if value is None:
+            return self.hedge.max_deadline
+        return min(self.hedge.max_deadline, max(self.hedge.min_deadline, value))
+
+    def _hedge_at(self, attempt: _Attempt) -> float:
+        # The deadline runs from admission; a request stuck in our queue waits at most max_deadline
+        if attempt.admitted.done():
+            return attempt.admitted.result() + self.deadline(attempt.index)
+        return attempt.started + self.hedge.max_deadline
+
+    async def _race(self, text: str, fmt: AudioFormat) -> _Attempt:
+        """The first attempt to produce audio; later providers join on a slow start or an error"""
+        waiting = list(range(len(self.providers)))
+        live: List[_Attempt] = []
+        error: Optional[Exception] = None
+        latest: Optional[_Attempt] = None
+
+        def launch():
+            nonlocal latest
+            index = waiting.pop(0)
+            latest = _Attempt(index, self.providers[index], self.latency[index], text, fmt)
+            live.append(latest)
+
+        launch()
+        winner = None
+        try:
+            while live:
+                pending = [attempt.first for attempt in live]
+                timeout = None
+                if waiting:
+                    timeout = max(0.0, self._hedge_at(latest) - time.monotonic())
+                    if not latest.admitted.done():
+                        pending.append(latest.admitted)  # admission moves the deadline
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self.hedges += 1
+                    launch()
+                    continue
+                for attempt in list(live):
+                    if not attempt.first.done():
+                        continue
+                    if attempt.first.exception() is None:
+                        winner = attempt
+                        attempt.stats.wins += 1
+                        return winner
+                    error = attempt.first.exception()
+                    logger.warning("TTS provider failed before audio: %s", error, extra={
+                        'provider': attempt.provider.config.provider_name
+                    })
+                    live.remove(attempt)
+                    if waiting:
+                        self.failovers += 1
+                        launch()
+            raise error
+        finally:
+            for attempt in live:
+                if attempt is not winner:
+                    attempt.cancel()
+
+    def stream_speech(self, text: str, audio_format: Optional[AudioFormat] = None) -> "HedgedStream":
+        return HedgedStream(self, text, audio_format or self.output_format)
+
+    async def _stream(self, text: str, fmt: AudioFormat, stream: "HedgedStream") -> AsyncIterator[bytes]:
+        winner = await self._race(text, fmt)
+        stream.cacheable = winner.provider is self.providers[0]
+        try:
+            yield winner.first.result()
+            while True:
+                item = await winner.queue.get()
+                if item is None:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            winner.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'hedges': self.hedges,
+            'failovers': self.failovers,
+            'providers': {
+                provider.config.provider_name: stats.summary()
+                for provider, stats in zip(self.providers, self.latency)
+            }
+        }
+
+    async def cleanup(self):
+        for provider in self.providers:
+            await provider.cleanup()
+
+
+class HedgedStream:
+    """Audio of one hedged request, cacheable is False once a fallback provider won
+
+    A fallback speaks in its own voice; CachedTTSProvider checks cacheable so the
+    phrase isn't replayed in that voice on every later hit.
+    """
+
+    def __init__(self, provider: HedgedTTSProvider, text: str, fmt: AudioFormat):
+        self.cacheable = True
+        self._chunks = provider._stream(text, fmt, self)
+
+    def __aiter__(self) -> "HedgedStream":
+        return self
+
+    async def __anext__(self) -> bytes:
+        return await self._chunks.__anext__()
+
+    async def aclose(self):
+        await self._chunks.aclose()
@@ -0,0 +1,71 @@
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, Optional
+
+from services.admission import AdmissionScheduler, retry_after
+from .base import AudioFormat, BaseTTSProvider
+
+
+class ScheduledTTSProvider(BaseTTSProvider):
+    """Queues synthesis under the provider's concurrency and character-rate budget
+
+    Within a call, the segment about to play is requested first, so the look-ahead
+    segments after it rank behind other calls' opening segments.
+    """
+
+    def __init__(self, provider: BaseTTSProvider):
+        self.provider = provider
+        self.config = provider.config
+        self.supported_formats = provider.supported_formats
+        self.output_format = provider.output_format
+        self.scheduler = AdmissionScheduler(f"tts.{provider.config.provider_name}", provider.config.admission)
+
+    def cache_identity(self) -> Dict[str, Any]:
+        return self.provider.cache_identity()
+
+    def stream_speech(self, text: str, audio_format: Optional[AudioFormat] = None) -> "ScheduledStream":
+        return ScheduledStream(self, text, audio_format)
+
+    async def _stream(
+        self, text: str, audio_format: Optional[AudioFormat], stream: "ScheduledStream"
+    ) -> AsyncIterator[bytes]:
+        retries = self.config.admission.retries
+        for attempt in range(retries + 1):
+            started = False
+            try:
+                async with self.scheduler.slot(len(text)):
+                    if not stream.admitted.done():
+                        stream.admitted.set_result(time.monotonic())
+                    async for chunk in self.provider.stream_speech(text, audio_format):
+                        started = True
+                        yield chunk
+                return
+            except Exception as e:
+                delay = retry_after(e)
+                if started or delay is None or attempt == retries:
+                    raise
+                self.scheduler.backoff(delay)
+
+    async def cleanup(self):
+        await self.provider.cleanup()
+
+
+class ScheduledStream:
+    """Audio of one scheduled request, admitted resolves to the monotonic time it left the queue
+
+    Lets HedgedTTSProvider tell the provider's own latency from time spent waiting
+    on our admission queue.
+    """
+
+    def __init__(self, provider: ScheduledTTSProvider, text: str, audio_format: Optional[AudioFormat]):
+        self.admitted: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._chunks = provider._stream(text, audio_format, self)
+
+    def __aiter__(self) -> "ScheduledStream":
+        return self
+
+    async def __anext__(self) -> bytes:
+        return await self._chunks.__anext__()
+
+    async def aclose(self):
+        await self._chunks.aclose()
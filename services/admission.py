@@ -0,0 +1,185 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+
+from config.base_config import AdmissionConfig
+from services.metrics import Histogram
+from utils.logging import session_id_var
+
+QUEUE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+schedulers: Dict[str, "AdmissionScheduler"] = {}
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Seconds to back off when the provider rejected a request with 429, else None"""
+    response = getattr(error, 'response', None)
+    status = getattr(error, 'status_code', None) or getattr(response, 'status_code', None)
+    if status != 429:
+        return None
+    try:
+        return float(response.headers.get('retry-after'))
+    except (AttributeError, TypeError, ValueError):
+        return 1.0
+
+
+class AdmissionScheduler:
+    """Admits requests to one provider within a concurrency limit and a rate budget, fairly across calls
+
+    Waiting requests are ordered by a virtual time: when they arrived, pushed back by
+    lookahead_penalty for each request the same call already has outstanding and by
+    cost_weight per unit of cost. A call's first segment therefore goes ahead of other
+    calls' look-ahead, short requests ahead of long ones, and nothing waits forever.
+    """
+
+    def __init__(self, name: str, config: Optional[AdmissionConfig] = None):
+        config = config or AdmissionConfig()
+        self.name = name
+        self.max_concurrent = config.max_concurrent
+        self.rate = config.rate
+        self.burst = config.burst or config.rate
+        self.lookahead_penalty = config.lookahead_penalty
+        self.cost_weight = config.cost_weight
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.queue: List[tuple] = []
+        self.in_flight = 0
+        self.outstanding: Dict[Optional[str], int] = defaultdict(int)  # queued or admitted, per session
+        self.queue_time = Histogram(QUEUE_BUCKETS)
+        self.rate_limited = 0
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+        schedulers[name] = self
+
+    @asynccontextmanager
+    async def slot(self, cost: float = 1.0, session_id: Optional[str] = None) -> AsyncIterator[None]:
+        """Hold one of the provider's slots for the duration of the block"""
+        session_id = session_id or session_id_var.get()
+        rank = self.outstanding[session_id]
+        self.outstanding[session_id] += 1
+        enqueued = time.monotonic()
+        try:
+            if not self.queue and self._has_capacity() and self._rate_wait(cost) == 0:
+                self._admit(cost)
+            else:
+                future = asyncio.get_running_loop().create_future()
+                order = enqueued + rank * self.lookahead_penalty + cost * self.cost_weight
+                heapq.heappush(self.queue, (order, next(self._seq), future, cost))
+                self._pump()
+                try:
+                    await future
+                except asyncio.CancelledError:
+                    if future.done() and not future.cancelled():
+                        self._release()  # admitted just as the caller gave up
+                    raise
+            self.queue_time.observe(time.monotonic() - enqueued)
+            try:
+                yield
+            finally:
+                self._release()
+        finally:
+            self.outstanding[session_id] -= 1
+            if not self.outstanding[session_id]:
+                del self.outstanding[session_id]
+
+    def backoff(self, seconds: float):
+        """Stop admitting for a while, after the provider said we went over its limit"""
+        self.rate_limited += 1
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def _has_capacity(self) -> bool:
+        return not self.max_concurrent or self.in_flight < self.max_concurrent
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _rate_wait(self, cost: float) -> float:
+        now = time.monotonic()
+        if self.paused_until > now:
+            return self.paused_until - now
+        if not self.rate:
+            return 0.0
+        self._refill(now)
+        # A request bigger than the bucket waits for a full bucket and leaves it in debt
+        needed = min(cost, self.burst)
+        return 0.0 if self.tokens >= needed else (needed - self.tokens) / self.rate
+
+    def _admit(self, cost: float):
+        self.in_flight += 1
+        if self.rate:
+            self.tokens -= cost
+
+    def charge(self, cost: float):
+        """Spend budget only known once a request is done, such as the tokens of a reply"""
+        if self.rate and cost:
+            self._refill(time.monotonic())
+            self.tokens -= cost
+
+    def _release(self):
+        self.in_flight -= 1
+        self._pump()
+
+    def _pump(self):
+        while self.queue:
+            _, _, future, cost = self.queue[0]
+            if future.cancelled():
+                heapq.heappop(self.queue)
+                continue
+            if not self._has_capacity():
+                return  # the next release pumps again
+            wait = self._rate_wait(cost)
+            if wait > 0:
+                if self._wakeup is None:
+                    self._wakeup = asyncio.get_running_loop().call_later(wait, self._on_wakeup)
+                return
+            heapq.heappop(self.queue)
+            self._admit(cost)
+            future.set_result(None)
+
+    def _on_wakeup(self):
+        self._wakeup = None
+        self._pump()
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, future, _ in self.queue if not future.cancelled())
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'in_flight': self.in_flight,
+            'queued': self.queued,
+            'admitted': self.queue_time.count,
+            'mean_queue_ms': round(self.queue_time.sum / self.queue_time.count * 1000, 2)
+            if self.queue_time.count else 0.0,
+            'rate_limited': self.rate_limited
+        }
+
+
+def render() -> str:
+    """Queue metrics of every scheduler in the process, Prometheus text format"""
+    lines = [
+        "# HELP voice_provider_queue_seconds Time requests waited for admission to a provider.",
+        "# TYPE voice_provider_queue_seconds histogram",
+    ]
+    for name in sorted(schedulers):
+        histogram = schedulers[name].queue_time
+        for bound, count in histogram.cumulative():
+            lines.append(f'voice_provider_queue_seconds_bucket{{provider="{name}",le="{bound}"}} {count}')
+        lines.append(f'voice_provider_queue_seconds_sum{{provider="{name}"}} {histogram.sum:.6f}')
+        lines.append(f'voice_provider_queue_seconds_count{{provider="{name}"}} {histogram.count}')
+    for metric, kind, help_text, attr in (
+        ("voice_provider_in_flight", "gauge", "Requests admitted and not yet finished.", "in_flight"),
+        ("voice_provider_queued", "gauge", "Requests waiting for admission.", "queued"),
+        ("voice_provider_rate_limited_total", "counter", "429 responses that paused admission.", "rate_limited"),
+    ):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for name in sorted(schedulers):
+            lines.append(f'{metric}{{provider="{name}"}} {getattr(schedulers[name], attr)}')
+    return "\n".join(lines) + "\n"
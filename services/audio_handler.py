@@ -1,25 +1,61 @@
-import base64
 import io
 import json
 import asyncio
 from typing import Tuple
 from pydub import AudioSegment
 
+from utils.audio import encode_media_payload, pcm16_to_ulaw
+
+
 class AudioHandler:
+    @staticmethod
+    def to_mulaw(data: bytes, sample_rate: int = 8000, channels: int = 1) -> bytes:
+        """Encode 16-bit PCM as 8 kHz mono mu-law, resampling only when needed"""
+        if sample_rate != 8000 or channels != 1:
+            data = AudioSegment(
+                data=bytes(data), sample_width=2, frame_rate=sample_rate, channels=channels
+            ).set_frame_rate(8000).set_channels(1).raw_data
+        return pcm16_to_ulaw(data)
+
+    @staticmethod
+    def to_mp3(data: bytes, sample_rate: int, channels: int = 1) -> bytes:
+        """Encode 16-bit PCM as mp3, blocks on an ffmpeg subprocess"""
+        buffer = io.BytesIO()
+        AudioSegment(
+            data=bytes(data), sample_width=2, frame_rate=sample_rate, channels=channels
+        ).export(buffer, format="mp3")
+        return buffer.getvalue()
+
     @staticmethod
     async def send_audio_chunk(websocket, stream_sid: str, chunk: AudioSegment, should_interrupt: bool) -> Tuple[bool, float]:
         if should_interrupt:
             return False, 0
 
-        buffer = io.BytesIO()
-        chunk.export(buffer, format="wav", parameters=["-acodec", "pcm_mulaw"])
-        audio_data = buffer.getvalue()
+        chunk = chunk.set_sample_width(2)
+        audio_data = AudioHandler.to_mulaw(chunk.raw_data, chunk.frame_rate, chunk.channels)
+        return await AudioHandler.send_mulaw_chunk(websocket, stream_sid, audio_data, should_interrupt)
+
+    @staticmethod
+    async def send_mulaw_chunk(websocket, stream_sid: str, chunk: bytes, should_interrupt: bool) -> Tuple[bool, float]:
+        # Bytes are already in Twilio's wire format, forward them as-is
+        if should_interrupt:
+            return False, 0
 
         await websocket.send_text(json.dumps({
             "event": "media",
             "streamSid": stream_sid,
             "media": {
-                "payload": base64.b64encode(audio_data).decode('utf-8')
+                "payload": encode_media_payload(chunk)
             }
         }))
-        return True, 0
\ No newline at end of file
+        return True, 0
+
+    @staticmethod
+    async def send_mark(websocket, stream_sid: str, name: str):
+        # Twilio echoes the mark back once the audio sent before it has played
+        await websocket.send_text(json.dumps({"event": "mark", "streamSid": stream_sid, "mark": {"name": name}}))
+
+    @staticmethod
+    async def send_clear(websocket, stream_sid: str):
+        # Twilio drops the audio it has buffered and echoes any marks still pending
+        await websocket.send_text(json.dumps({"event": "clear", "streamSid": stream_sid}))
@@ -0,0 +1,108 @@
+import asyncio
+import functools
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Tuple
+
+
+def _call_shared(fn: Callable, name: str, size: int, args: Tuple) -> Tuple[str, int]:
+    # Runs in a worker process: input and output travel through shared memory, not pickles
+    shm = SharedMemory(name=name)
+    view = shm.buf[:size]
+    try:
+        result = fn(view, *args)
+    finally:
+        view.release()
+        shm.close()
+    out = SharedMemory(create=True, size=max(1, len(result)))
+    out.buf[:len(result)] = result
+    out.close()
+    return out.name, len(result)
+
+
+def _discard_shared(shm: SharedMemory, future: asyncio.Future):
+    # The caller gave up: free the input once the worker is done with it, and the output it made
+    shm.close()
+    shm.unlink()
+    if future.cancelled() or future.exception() is not None:
+        return
+    name, _ = future.result()
+    out = SharedMemory(name=name)
+    out.close()
+    out.unlink()
+
+
+class AudioExecutor:
+    """Moves CPU-bound audio work off the event loop, onto thread or process pools"""
+
+    def __init__(self, threads: int = 4, processes: int = 0, offload_min_bytes: int = 16384):
+        self.thread_pool = ThreadPoolExecutor(threads, thread_name_prefix='audio') if threads else None
+        self.process_pool = ProcessPoolExecutor(processes) if processes else None
+        # Below this size the hop to a pool costs more than the work itself
+        self.offload_min_bytes = offload_min_bytes
+        self.inline_calls = 0
+        self.thread_calls = 0
+        self.process_calls = 0
+
+    async def run(self, fn: Callable, *args: Any) -> Any:
+        """Run fn on the thread pool, for work that releases the GIL or waits on a subprocess"""
+        if self.thread_pool is None:
+            self.inline_calls += 1
+            return fn(*args)
+        self.thread_calls += 1
+        return await asyncio.get_running_loop().run_in_executor(self.thread_pool, functools.partial(fn, *args))
+
+    async def transform(self, fn: Callable, data: bytes, *args: Any) -> bytes:
+        """Apply fn(data, *args) -> bytes off the loop, in a worker process when there is a pool
+
+        fn must be a module-level function taking any bytes-like object.
+        """
+        if len(data) < self.offload_min_bytes:
+            self.inline_calls += 1
+            return fn(data, *args)
+        if self.process_pool is None:
+            return await self.run(fn, data, *args)
+
+        self.process_calls += 1
+        shm = SharedMemory(create=True, size=len(data))
+        future = None
+        try:
+            shm.buf[:len(data)] = data
+            future = asyncio.get_running_loop().run_in_executor(
+                self.process_pool, _call_shared, fn, shm.name, len(data), args
+            )
+            # Cancelling (e.g. on barge-in) must not orphan the shared memory the worker is using
+            name, size = await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if future is not None:
+                # Runs at once when the result already came back
+                future.add_done_callback(functools.partial(_discard_shared, shm))
+                raise
+            shm.close()
+            shm.unlink()
+            raise
+        except BaseException:
+            shm.close()
+            shm.unlink()
+            raise
+        shm.close()
+        shm.unlink()
+        out = SharedMemory(name=name)
+        try:
+            return bytes(out.buf[:size])
+        finally:
+            out.close()
+            out.unlink()
+
+    def stats(self):
+        return {
+            'inline_calls': self.inline_calls,
+            'thread_calls': self.thread_calls,
+            'process_calls': self.process_calls
+        }
+
+    def shutdown(self):
+        if self.thread_pool:
+            self.thread_pool.shutdown(wait=False, cancel_futures=True)
+        if self.process_pool:
+            self.process_pool.shutdown(wait=False, cancel_futures=True)
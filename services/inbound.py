@@ -0,0 +1,37 @@
+from typing import Optional
+
+
+class FrameAggregator:
+    """Gathers inbound 20 ms frames into larger packets so STT sees a few sends per second, not fifty"""
+
+    def __init__(self, batch_ms: int = 80, bytes_per_ms: float = 8):
+        self.batch_bytes = int(batch_ms * bytes_per_ms)
+        # Preallocated, frames are copied in place; only a pre-roll burst can outgrow it
+        self.buffer = bytearray(self.batch_bytes)
+        self.size = 0
+        self.frames_in = 0
+        self.packets_out = 0
+
+    def add(self, frame: bytes) -> Optional[bytes]:
+        """Buffer a frame, returns a packet once a full batch is gathered"""
+        end = self.size + len(frame)
+        if end > len(self.buffer):
+            self.buffer.extend(bytes(end - len(self.buffer)))
+        self.buffer[self.size:end] = frame
+        self.size = end
+        self.frames_in += 1
+        if self.size >= self.batch_bytes:
+            return self.flush()
+        return None
+
+    def flush(self) -> Optional[bytes]:
+        """Whatever is buffered as a packet, at turn boundaries and before the call ends"""
+        if not self.size:
+            return None
+        packet = bytes(memoryview(self.buffer)[:self.size])
+        self.size = 0
+        self.packets_out += 1
+        return packet
+
+    def stats(self):
+        return {'frames_in': self.frames_in, 'packets_out': self.packets_out}
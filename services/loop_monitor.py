@@ -0,0 +1,193 @@
+import asyncio
+import contextvars
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from services.metrics import Histogram
+from utils.logging import session_id_var
+
+logger = logging.getLogger(__name__)
+
+LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# Frames under here are ours, the innermost one names the pipeline stage that blocked
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def format_stack(frame, limit: int = 30) -> List[str]:
+    """Outermost first, as 'path:line function'"""
+    stack = []
+    while frame is not None and len(stack) < limit:
+        code = frame.f_code
+        stack.append(f"{os.path.relpath(code.co_filename, REPO_ROOT)}:{frame.f_lineno} {code.co_name}")
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def repo_stage(frame) -> Optional[str]:
+    while frame is not None:
+        code = frame.f_code
+        if code.co_filename.startswith(REPO_ROOT) and 'site-packages' not in code.co_filename:
+            module = os.path.splitext(os.path.relpath(code.co_filename, REPO_ROOT))[0].replace(os.sep, '.')
+            return f"{module}.{code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+class LoopMonitor:
+    """Measures event loop lag, and names the task, session and code path behind each stall
+
+    A heartbeat coroutine measures how late its sleeps wake up. A watchdog thread notices
+    when the heartbeat is overdue and samples the loop thread's stack while it is still
+    blocked, so the report shows the code that blocked rather than what ran afterwards.
+
+    The watchdog never touches tasks, contexts or frame locals of the blocked thread. A
+    task factory records each task's name and session on the loop thread, keyed by its
+    coroutine frame, and the watchdog only looks its sampled frames up by identity.
+    """
+
+    def __init__(self, interval: float = 0.05, slow_ms: float = 100, keep: int = 50):
+        self.interval = interval
+        self.slow = slow_ms / 1000
+        self.lag = Histogram(LAG_BUCKETS)
+        self.max_lag = 0.0
+        self.stalls: Deque[Dict] = deque(maxlen=keep)
+        self.stall_count = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._last_tick = time.monotonic()
+        self._pending: Optional[Tuple[float, Dict]] = None  # (heartbeat tick it belongs to, stall)
+        self._tasks: Dict[Any, List[Optional[str]]] = {}  # coroutine frame: [task name, session id]
+        self._task_factory = None  # the loop's factory before ours
+
+    def configure(self, interval: float, slow_ms: float):
+        self.interval = interval
+        self.slow = slow_ms / 1000
+
+    def start(self):
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._stopped.clear()
+        self._task_factory = self._loop.get_task_factory()
+        self._loop.set_task_factory(self._create_task)
+        self._task = asyncio.create_task(self._heartbeat(), name='loop_monitor')
+        self._watchdog = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._loop is not None and self._loop.get_task_factory() == self._create_task:
+            self._loop.set_task_factory(self._task_factory)
+        self._tasks.clear()
+
+    def _create_task(self, loop, coro, **kwargs):
+        frame = getattr(coro, 'cr_frame', None)
+        if frame is not None:
+            context = kwargs.get('context') or contextvars.copy_context()
+            entry = self._tasks[frame] = [None, context.get(session_id_var)]
+            # create_task names the task after the factory returns; scheduled ahead of its first step
+            loop.call_soon(lambda: entry.__setitem__(0, task.get_name()))
+        if self._task_factory is not None:
+            task = self._task_factory(loop, coro, **kwargs)
+        else:
+            task = asyncio.Task(coro, loop=loop, **kwargs)
+        if frame is not None:
+            task.add_done_callback(lambda _: self._tasks.pop(frame, None))
+        return task
+
+    def tag_session(self, session_id: Optional[str]):
+        """Attribute stalls in the current task to a session bound after the task started"""
+        task = asyncio.current_task()
+        entry = self._tasks.get(getattr(task.get_coro(), 'cr_frame', None)) if task else None
+        if entry is not None:
+            entry[1] = session_id
+
+    async def _heartbeat(self):
+        while True:
+            self._last_tick = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - self._last_tick - self.interval)
+            self.lag.observe(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if lag >= self.slow:
+                self._record_stall(lag)
+
+    def _record_stall(self, lag: float):
+        pending, self._pending = self._pending, None
+        # A capture from an earlier tick belongs to a stall the watchdog caught too late
+        stall = pending[1] if pending and pending[0] == self._last_tick else {}
+        stall['lag_ms'] = round(lag * 1000, 1)
+        stall['at'] = time.time()
+        self.stall_count += 1
+        self.stalls.append(stall)
+        logger.warning("Event loop stalled", extra={'stall': stall})
+
+    def _watch(self):
+        # Runs on its own thread; only reads state the loop thread publishes
+        while not self._stopped.wait(self.interval):
+            tick = self._last_tick
+            overdue = time.monotonic() - tick - self.interval
+            if overdue >= self.slow and (self._pending is None or self._pending[0] != tick):
+                self._pending = (tick, self._capture())
+
+    def _capture(self) -> Dict:
+        frame = sys._current_frames().get(self._loop_thread)
+        # The outermost recorded coroutine frame on the stack is the running task's
+        name, session_id = None, None
+        current = frame
+        while current is not None:
+            entry = self._tasks.get(current)
+            if entry is not None:
+                name, session_id = entry
+            current = current.f_back
+        return {
+            'task': name,
+            'session_id': session_id,
+            'stage': repo_stage(frame),
+            'stack': format_stack(frame)
+        }
+
+    def stats(self) -> Dict:
+        return {
+            'samples': self.lag.count,
+            'mean_ms': round(self.lag.sum / self.lag.count * 1000, 2) if self.lag.count else 0.0,
+            'max_ms': round(self.max_lag * 1000, 1),
+            'stalls': self.stall_count,
+            'recent_stalls': list(self.stalls)
+        }
+
+    def render(self) -> str:
+        lines = [
+            "# HELP voice_loop_lag_seconds How late the event loop ran a periodic timer.",
+            "# TYPE voice_loop_lag_seconds histogram",
+        ]
+        for bound, count in self.lag.cumulative():
+            lines.append(f'voice_loop_lag_seconds_bucket{{le="{bound}"}} {count}')
+        lines.append(f"voice_loop_lag_seconds_sum {self.lag.sum:.6f}")
+        lines.append(f"voice_loop_lag_seconds_count {self.lag.count}")
+        lines.append("# HELP voice_loop_stalls_total Times the event loop was blocked past the slow threshold.")
+        lines.append("# TYPE voice_loop_stalls_total counter")
+        lines.append(f"voice_loop_stalls_total {self.stall_count}")
+        return "\n".join(lines) + "\n"
+
+
+loop_monitor = LoopMonitor()
@@ -0,0 +1,158 @@
+import bisect
+import time
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+# Points in a turn, in the order they normally happen
+STAGES = (
+    "speech_end",
+    "final_transcript",
+    "llm_request",
+    "first_token",
+    "last_token",
+    "tts_request",
+    "first_audio",
+    "first_frame_sent",
+    "last_frame_sent",
+)
+
+# Stages that keep their latest time rather than their first
+LATEST_WINS = {"speech_end", "final_transcript", "last_token", "last_frame_sent"}
+
+# Durations between two stages worth tracking on their own
+SPANS = {
+    "stt_finalize": ("speech_end", "final_transcript"),
+    "llm_first_token": ("llm_request", "first_token"),
+    "llm_total": ("llm_request", "last_token"),
+    "tts_first_audio": ("tts_request", "first_audio"),
+    "playout": ("first_frame_sent", "last_frame_sent"),
+}
+
+DEFAULT_BUCKETS = (0.025, 0.05, 0.1, 0.15, 0.2, 0.3, 0.4, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0)
+
+
+class TurnTimer:
+    """Monotonic timestamps for the stages of one conversational turn"""
+
+    def __init__(self):
+        self.marks: Dict[str, float] = {}
+
+    def mark(self, stage: str, at: Optional[float] = None):
+        if stage in self.marks and stage not in LATEST_WINS:
+            return
+        self.marks[stage] = time.monotonic() if at is None else at
+
+    def anchor(self) -> Optional[float]:
+        if "speech_end" in self.marks:
+            return self.marks["speech_end"]
+        return min(self.marks.values(), default=None)
+
+    def offsets(self) -> Dict[str, float]:
+        """Seconds from the end of speech to each recorded stage"""
+        anchor = self.anchor()
+        if anchor is None:
+            return {}
+        return {
+            stage: round(self.marks[stage] - anchor, 4)
+            for stage in STAGES if stage in self.marks
+        }
+
+    def spans(self) -> Dict[str, float]:
+        return {
+            name: round(self.marks[end] - self.marks[start], 4)
+            for name, (start, end) in SPANS.items()
+            if start in self.marks and end in self.marks
+        }
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus layout"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        value = max(0.0, value)
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        result = []
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            result.append((repr(float(bound)), total))
+        result.append(("+Inf", self.count))
+        return result
+
+
+class MetricsRegistry:
+    """Process-wide turn latency histograms, rendered in Prometheus text format"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.stage_latency: Dict[str, Histogram] = {}
+        self.span_latency: Dict[str, Histogram] = {}
+        self.turns = 0
+
+    def observe_turn(self, turn: TurnTimer):
+        self.turns += 1
+        for stage, seconds in turn.offsets().items():
+            if stage != "speech_end":
+                self._histogram(self.stage_latency, stage).observe(seconds)
+        for span, seconds in turn.spans().items():
+            self._histogram(self.span_latency, span).observe(seconds)
+
+    def _histogram(self, family: Dict[str, Histogram], key: str) -> Histogram:
+        histogram = family.get(key)
+        if histogram is None:
+            histogram = family[key] = Histogram(self.buckets)
+        return histogram
+
+    def render(self) -> str:
+        lines = [
+            "# HELP voice_turns_total Completed conversational turns.",
+            "# TYPE voice_turns_total counter",
+            f"voice_turns_total {self.turns}",
+        ]
+        families = (
+            ("voice_turn_stage_seconds", "Time from end of user speech to each stage of the reply.",
+             "stage", self.stage_latency),
+            ("voice_turn_span_seconds", "Duration between two stages of a turn.",
+             "span", self.span_latency),
+        )
+        for name, help_text, label, family in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for key in sorted(family):
+                histogram = family[key]
+                for bound, count in histogram.cumulative():
+                    lines.append(f'{name}_bucket{{{label}="{key}",le="{bound}"}} {count}')
+                lines.append(f'{name}_sum{{{label}="{key}"}} {histogram.sum:.6f}')
+                lines.append(f'{name}_count{{{label}="{key}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+async def timed_tokens(tokens: AsyncIterator[str], turn: TurnTimer) -> AsyncIterator[str]:
+    async for token in tokens:
+        turn.mark("first_token")
+        turn.mark("last_token")
+        yield token
+
+
+async def timed_segments(segments: AsyncIterator, turn: TurnTimer) -> AsyncIterator:
+    """Record TTS timings of the opening segment, once the caller has consumed it"""
+    try:
+        async for segment in segments:
+            turn.mark("tts_request", at=segment.requested_at)
+            yield segment
+            if segment.first_audio_at is not None:
+                turn.mark("first_audio", at=segment.first_audio_at)
+    finally:
+        await segments.aclose()
@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+
+class AudioPacer:
+    """Sends fixed-size audio frames on a monotonic clock, a small lead ahead of real time"""
+
+    def __init__(
+        self,
+        send_frame: Callable[[bytes], Awaitable],
+        frame_ms: int = 20,
+        lead_ms: int = 60,
+        bytes_per_ms: float = 8,
+        silence: bytes = b'\xff'
+    ):
+        self.send_frame = send_frame
+        self.frame_ms = frame_ms
+        self.lead = lead_ms / 1000
+        self.frame_bytes = int(frame_ms * bytes_per_ms)
+        self.silence = silence
+        self.frames: Deque[Union[bytes, Callable[[], Awaitable]]] = deque()
+        self.partial = bytearray()
+        self.open = False  # an utterance is being fed, running dry counts as an underrun
+        self.play_until = 0.0  # when the receiver finishes playing what we have sent
+        self._between_utterances = True
+        self._flushed = False  # set by flush(), ends the utterance _run last saw running dry
+        self._ready = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._task: Optional[asyncio.Task] = None
+
+        self.frames_sent = 0
+        self.underruns = 0
+        self.underrun_ms = 0.0
+        self.max_drift_ms = 0.0
+        self.total_drift_ms = 0.0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def push(self, data: bytes):
+        self.open = True
+        self.partial += data
+        whole = len(self.partial) - len(self.partial) % self.frame_bytes
+        for i in range(0, whole, self.frame_bytes):
+            self.frames.append(bytes(self.partial[i:i + self.frame_bytes]))
+        del self.partial[:whole]
+        if self.frames:
+            self._drained.clear()
+            self._ready.set()
+
+    def end_utterance(self):
+        """Pad out the last partial frame; the pacer may run dry after this"""
+        if self.partial:
+            pad = self.frame_bytes - len(self.partial)
+            self.frames.append(bytes(self.partial) + self.silence * pad)
+            self.partial.clear()
+            self._drained.clear()
+            self._ready.set()
+        self.open = False
+
+    def call(self, callback: Callable[[], Awaitable]):
+        """Await callback once every frame pushed before it has been sent, e.g. to send a mark
+
+        Call between utterances, a partial frame still being gathered goes out after it.
+        """
+        self.frames.append(callback)
+        self._drained.clear()
+        self._ready.set()
+
+    async def drain(self):
+        await self._drained.wait()
+
+    def flush(self) -> float:
+        """Drop everything not yet sent, returns the milliseconds of audio dropped"""
+        dropped_bytes = sum(len(frame) for frame in self.frames if isinstance(frame, bytes)) + len(self.partial)
+        dropped_ms = dropped_bytes / self.frame_bytes * self.frame_ms
+        self.frames.clear()
+        self.partial.clear()
+        self.open = False
+        self.play_until = time.monotonic()
+        self._between_utterances = True
+        self._flushed = True
+        self._drained.set()
+        return dropped_ms
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'frames_sent': self.frames_sent,
+            'underruns': self.underruns,
+            'underrun_ms': round(self.underrun_ms, 1),
+            'max_drift_ms': round(self.max_drift_ms, 2),
+            'mean_drift_ms': round(self.total_drift_ms / self.frames_sent, 2) if self.frames_sent else 0.0
+        }
+
+    async def _run(self):
+        frame_seconds = self.frame_ms / 1000
+        while True:
+            if not self.frames:
+                self._drained.set()
+                self._ready.clear()
+                # Decided when running dry, push() reopens the utterance before we wake
+                between_utterances = not self.open
+                self._flushed = False
+                await self._ready.wait()
+                # A flush while waiting (barge-in) ended that utterance, the silence since is no underrun
+                self._between_utterances = between_utterances or self._flushed
+                continue
+
+            if not isinstance(self.frames[0], bytes):
+                callback = self.frames.popleft()
+                try:
+                    await callback()
+                except Exception as e:
+                    logger.error("Error in pacer callback: %s", e)
+                continue
+
+            now = time.monotonic()
+            if self.play_until < now:
+                if not self._between_utterances:
+                    # The receiver ran out of audio in the middle of an utterance
+                    self.underruns += 1
+                    self.underrun_ms += (now - self.play_until) * 1000
+                self.play_until = now
+            self._between_utterances = False
+
+            due = self.play_until - self.lead
+            if due > now:
+                await asyncio.sleep(due - now)
+                if not self.frames or not isinstance(self.frames[0], bytes):
+                    continue  # flushed while waiting
+                # How late the loop woke us up for this frame
+                drift_ms = max(0.0, time.monotonic() - due) * 1000
+                self.max_drift_ms = max(self.max_drift_ms, drift_ms)
+                self.total_drift_ms += drift_ms
+
+            frame = self.frames.popleft()
+            self.play_until += frame_seconds
+            self.frames_sent += 1
+            try:
+                await self.send_frame(frame)
+            except Exception as e:
+                logger.error("Error sending audio frame: %s", e)
+                self.flush()
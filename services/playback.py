@@ -0,0 +1,111 @@
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
+MARK_GRACE = 0.5  # seconds a mark may lag the audio it follows before playback counts as over anyway
+
+
+def heard_words(text: str, fraction: float) -> str:
+    """The leading share of text, cut back to the last whole word"""
+    if fraction >= 1:
+        return text
+    head = text[:max(0, int(len(text) * fraction))]
+    if text[len(head):len(head) + 1].strip():
+        head = head.rpartition(' ')[0]  # stopped inside a word
+    return head.rstrip()
+
+
+@dataclass
+class PlayedSegment:
+    text: str
+    name: str  # of the mark sent after its audio
+    audio_ms: float = 0.0  # pushed for playback so far
+    started_at: Optional[float] = None  # when the caller starts hearing it
+    sent: bool = False  # all audio and the mark went out
+    played_at: Optional[float] = None  # the mark came back
+
+
+class PlaybackTracker:
+    """Follows how much of the reply the caller has actually heard
+
+    A mark goes to Twilio after each segment's audio and Twilio echoes it once playback
+    gets there. A segment counts as heard when its mark is back; the one playing when the
+    caller barges in is heard for the time since it started, as a share of its length.
+    Without marks, the pacer clock alone places segment starts and ends.
+    """
+
+    def __init__(self):
+        self.reply = 0
+        self.segments: List[PlayedSegment] = []
+        self.interrupted_at: Optional[float] = None
+        self.replying = False  # the reply is still producing segments
+        self.barge_ins = 0
+
+    def start_reply(self):
+        self.reply += 1
+        self.segments = []
+        self.interrupted_at = None
+        self.replying = True
+
+    def finish_reply(self):
+        self.replying = False
+
+    def add_segment(self, text: str) -> PlayedSegment:
+        segment = PlayedSegment(text, f"{self.reply}.{len(self.segments)}")
+        self.segments.append(segment)
+        return segment
+
+    def acknowledge(self, name: str) -> bool:
+        """A mark came back, False if it belongs to an earlier reply"""
+        if self.interrupted_at is not None:
+            return False  # echoed by the clear, not played
+        for segment in self.segments:
+            if segment.name == name:
+                segment.played_at = time.monotonic()
+                return True
+        return False
+
+    def _position(self, at: float):
+        """Per started segment: its start, and how much of it had been heard at `at`"""
+        previous_end = 0.0
+        for segment in self.segments:
+            if segment.started_at is None:
+                return
+            start = max(segment.started_at, previous_end)
+            if segment.played_at is not None and segment.played_at <= at:
+                fraction = 1.0
+                previous_end = segment.played_at
+            else:
+                duration = segment.audio_ms / 1000
+                fraction = min(1.0, max(0.0, (at - start) / duration)) if duration else 0.0
+                previous_end = start + duration
+            yield segment, start, fraction
+
+    @property
+    def playing(self) -> bool:
+        """Reply audio may still be coming out of the caller's phone"""
+        if self.interrupted_at is not None or not self.segments or self.segments[0].started_at is None:
+            return False
+        if self.replying:
+            return True  # includes gaps while the next segment is synthesized
+        return any(
+            segment.played_at is None and fraction < 1
+            for segment, _, fraction in self._position(time.monotonic() - MARK_GRACE)
+        )
+
+    def interrupt(self):
+        self.interrupted_at = time.monotonic()
+        self.barge_ins += 1
+
+    def heard_text(self) -> str:
+        """What the caller heard of the reply, all of it unless they barged in"""
+        if self.interrupted_at is None:
+            return ' '.join(segment.text for segment in self.segments if segment.sent)
+        heard = []
+        for segment, _, fraction in self._position(self.interrupted_at):
+            words = heard_words(segment.text, fraction)
+            if words:
+                heard.append(words)
+            if fraction < 1:
+                break
+        return ' '.join(heard)
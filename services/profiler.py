@@ -0,0 +1,54 @@
+import asyncio
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+
+def _fold(frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+        frame = frame.f_back
+    names.reverse()
+    return ';'.join(names)
+
+
+class StackSampler:
+    """In-process sampling profiler, folded stacks that flamegraph.pl and speedscope read directly"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def sample(self, seconds: float, interval: float = 0.005, thread_id: Optional[int] = None) -> str:
+        """Blocks the calling thread for `seconds`; samples one thread, or every thread but this one"""
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("A profile is already running")
+        try:
+            me = threading.get_ident()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stacks: Counter = Counter()
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                for ident, frame in sys._current_frames().items():
+                    if ident == me or (thread_id is not None and ident != thread_id):
+                        continue
+                    stacks[f"{names.get(ident, ident)};{_fold(frame)}"] += 1
+                time.sleep(interval)
+            return ''.join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+        finally:
+            self._lock.release()
+
+    async def profile(self, seconds: float, interval: float = 0.005, loop_only: bool = False) -> str:
+        """Sample from a worker thread, so the loop being profiled keeps running"""
+        thread_id = threading.get_ident() if loop_only else None
+        return await asyncio.to_thread(self.sample, seconds, interval, thread_id)
+
+
+stack_sampler = StackSampler()
@@ -0,0 +1,102 @@
+import json
+import struct
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, NamedTuple, Optional
+
+MAGIC = b"VREC1\n"
+
+# Every record: seconds since the recording started, kind, stream id, payload length
+HEADER = struct.Struct("<dBII")
+
+META = 0
+INBOUND_AUDIO = 1  # raw audio as received from the caller
+INBOUND_EVENT = 2  # JSON control events (Twilio start/stop etc.)
+STT_EVENT = 3  # JSON transcript events as the pipeline consumed them
+LLM_REQUEST = 4  # JSON messages, stream id ties tokens to the request
+LLM_TOKEN = 5
+LLM_END = 6
+TTS_REQUEST = 7  # JSON text and audio format
+TTS_AUDIO = 8
+TTS_END = 9
+
+KIND_NAMES = {
+    META: "meta", INBOUND_AUDIO: "inbound_audio", INBOUND_EVENT: "inbound_event", STT_EVENT: "stt_event",
+    LLM_REQUEST: "llm_request", LLM_TOKEN: "llm_token", LLM_END: "llm_end",
+    TTS_REQUEST: "tts_request", TTS_AUDIO: "tts_audio", TTS_END: "tts_end",
+}
+
+
+class Record(NamedTuple):
+    t: float
+    kind: int
+    stream: int
+    payload: bytes
+
+    def json(self) -> Any:
+        return json.loads(self.payload)
+
+
+class SessionRecorder:
+    """Append-only log of everything a call exchanged with the caller and the providers"""
+
+    def __init__(self, path: str, meta: Optional[Dict[str, Any]] = None):
+        self.path = path
+        self.started = time.monotonic()
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+        self._next_stream = 1
+        self.write(META, json.dumps(meta or {}).encode())
+
+    def write(self, kind: int, payload: bytes, stream: int = 0):
+        if self.file.closed:
+            return
+        self.file.write(HEADER.pack(time.monotonic() - self.started, kind, stream, len(payload)))
+        self.file.write(payload)
+
+    def write_json(self, kind: int, data: Any, stream: int = 0):
+        self.write(kind, json.dumps(data).encode(), stream)
+
+    def new_stream(self) -> int:
+        stream = self._next_stream
+        self._next_stream += 1
+        return stream
+
+    async def llm_stream(self, messages: List[Dict[str, str]], tokens: AsyncIterator[str]) -> AsyncIterator[str]:
+        stream = self.new_stream()
+        self.write_json(LLM_REQUEST, messages, stream)
+        try:
+            async for token in tokens:
+                self.write(LLM_TOKEN, token.encode(), stream)
+                yield token
+        finally:
+            self.write(LLM_END, b'', stream)
+
+    async def tts_stream(self, text: str, format_name: str, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        stream = self.new_stream()
+        self.write_json(TTS_REQUEST, {"text": text, "format": format_name}, stream)
+        try:
+            async for chunk in chunks:
+                self.write(TTS_AUDIO, bytes(chunk), stream)
+                yield chunk
+        finally:
+            self.write(TTS_END, b'', stream)
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+
+def read_recording(path: str) -> Iterator[Record]:
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a session recording")
+        while True:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                return  # a truncated tail is what an interrupted recording leaves
+            t, kind, stream, length = HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length:
+                return
+            yield Record(t, kind, stream, payload)
@@ -0,0 +1,93 @@
+import re
+from typing import AsyncIterator, List, Optional
+
+ABBREVIATIONS = {
+    'mr', 'mrs', 'ms', 'dr', 'prof', 'sr', 'jr', 'st', 'mt', 'ft', 'vs', 'etc', 'eg', 'ie',
+    'inc', 'ltd', 'co', 'corp', 'no', 'approx', 'dept', 'est', 'fig', 'vol', 'ave', 'blvd',
+    'jan', 'feb', 'mar', 'apr', 'jun', 'jul', 'aug', 'sep', 'sept', 'oct', 'nov', 'dec',
+    'mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun', 'a.m', 'p.m', 'e.g', 'i.e', 'u.s'
+}
+
+# Terminal punctuation, clause punctuation or line breaks, followed by whitespace
+_BOUNDARY = re.compile(r'([.!?…]+|[,;:])["\'”’)\]]*(?=\s)|\n+')
+_LAST_WORD = re.compile(r'(\S+)$')
+_NEXT_CHAR = re.compile(r'\s*(\S)')
+
+
+class SentenceSegmenter:
+    """Splits streamed LLM text into speakable segments"""
+
+    def __init__(self, min_clause_chars: int = 40, max_chars: int = 250):
+        self.min_clause_chars = min_clause_chars
+        self.max_chars = max_chars
+        self.buffer = ""
+
+    def push(self, text: str) -> List[str]:
+        self.buffer += text
+        return self._split(final=False)
+
+    def flush(self) -> List[str]:
+        segments = self._split(final=True)
+        if self.buffer.strip():
+            segments.append(self.buffer.strip())
+        self.buffer = ""
+        return segments
+
+    def _split(self, final: bool) -> List[str]:
+        segments = []
+        start = 0
+        for match in _BOUNDARY.finditer(self.buffer):
+            decision = self._is_boundary(match, start, final)
+            if decision is None:
+                break
+            if decision:
+                segment = self.buffer[start:match.end()].strip()
+                if segment:
+                    segments.append(segment)
+                start = match.end()
+        self.buffer = self.buffer[start:]
+
+        # No boundary in sight, break long runs on the last space
+        while len(self.buffer) > self.max_chars:
+            cut = self.buffer.rfind(' ', 0, self.max_chars)
+            if cut <= 0:
+                cut = self.max_chars
+            segments.append(self.buffer[:cut].strip())
+            self.buffer = self.buffer[cut:]
+        return segments
+
+    def _is_boundary(self, match: re.Match, start: int, final: bool) -> Optional[bool]:
+        """True/False for a decided boundary, None when more text is needed"""
+        punct = match.group(1)
+        if punct is None:
+            return True
+
+        segment_len = len(self.buffer[start:match.end()].strip())
+        if punct in (',', ';', ':'):
+            return segment_len >= self.min_clause_chars
+
+        if '.' not in punct or '...' in punct:
+            return True
+
+        word = _LAST_WORD.search(self.buffer, start, match.start())
+        word = word.group(1).lstrip('"\'(“‘[').lower() if word else ''
+        if word in ABBREVIATIONS or re.fullmatch(r'[a-z]|(?:[a-z]\.)+[a-z]', word):
+            return False
+        # Numbered list items ("1. First") at the start of a segment
+        if word.isdigit() and segment_len == len(word) + 1:
+            return False
+
+        next_char = _NEXT_CHAR.match(self.buffer, match.end())
+        if next_char is None:
+            return True if final else None
+        return not next_char.group(1).islower()
+
+
+async def segment_text(tokens: AsyncIterator[str], segmenter: Optional[SentenceSegmenter] = None) -> AsyncIterator[str]:
+    """Turn a token stream into a stream of speakable segments"""
+    segmenter = segmenter or SentenceSegmenter()
+    async for token in tokens:
+        for segment in segmenter.push(token):
+            yield segment
+    for segment in segmenter.flush():
+        yield segment
@@ -0,0 +1,85 @@
+import asyncio
+import uuid
+from typing import Dict, List, Optional
+
+from providers.stt.base import BaseSTTProvider
+from providers.tts.base import BaseTTSProvider
+from services.metrics import TurnTimer, metrics
+from services.pacer import AudioPacer
+from services.playback import PlaybackTracker
+from services.recorder import SessionRecorder
+from services.speculation import SpeculativeGenerator
+from services.stream_manager import StreamManager
+from services.vad import SilenceGate, VoiceActivityDetector
+
+
+class CallSession:
+    """Per-call conversation, stream and transcript state"""
+
+    def __init__(self, session_id: str, stream_manager: StreamManager, stt_session, max_history: int = 5):
+        self.session_id = session_id
+        self.stream_manager = stream_manager
+        self.stt_session = stt_session
+        self.finish_event = asyncio.Event()
+        self.message_history: List[Dict[str, str]] = []
+        self.max_history = max_history
+        self.stream_sid: Optional[str] = None
+        self.pacer: Optional[AudioPacer] = None
+        self.playback = PlaybackTracker()
+        self.vad: Optional[VoiceActivityDetector] = None
+        self.silence_gate: Optional[SilenceGate] = None
+        self.turn_task: Optional[asyncio.Task] = None
+        self.speculator: Optional[SpeculativeGenerator] = None
+        self.turn = TurnTimer()  # stages of the user turn being heard
+        self.reply_turn: Optional[TurnTimer] = None  # stages of the reply being produced
+        self.turn_timings: List[Dict[str, float]] = []
+        self.recorder: Optional[SessionRecorder] = None
+
+    def add_to_history(self, role: str, content: str):
+        self.message_history.append({"role": role, "content": content})
+        # Keep only the last N messages
+        if len(self.message_history) > self.max_history:
+            self.message_history = self.message_history[-self.max_history:]
+
+    def start_reply(self) -> TurnTimer:
+        """Move the heard turn over to the reply, later speech starts a fresh one"""
+        self.reply_turn, self.turn = self.turn, TurnTimer()
+        return self.reply_turn
+
+    def finish_reply(self):
+        turn = self.reply_turn
+        if turn is None:
+            return
+        self.reply_turn = None
+        metrics.observe_turn(turn)
+        self.turn_timings.append(turn.offsets())
+
+
+class SessionFactory:
+    """Builds cheap per-call sessions on top of the shared provider clients"""
+
+    def __init__(self, stt_provider: BaseSTTProvider, tts_provider: BaseTTSProvider, max_history: int = 5):
+        self.stt_provider = stt_provider
+        self.tts_provider = tts_provider
+        self.max_history = max_history
+        self.active_sessions: Dict[str, CallSession] = {}
+
+    def create_session(self) -> CallSession:
+        session = CallSession(
+            session_id=uuid.uuid4().hex,
+            stream_manager=StreamManager(self.tts_provider),
+            stt_session=self.stt_provider.create_session(),
+            max_history=self.max_history
+        )
+        self.active_sessions[session.session_id] = session
+        return session
+
+    def release(self, session: CallSession):
+        session.finish_event.set()
+        if session.recorder:
+            session.recorder.close()
+        self.active_sessions.pop(session.session_id, None)
+
+    @property
+    def active_count(self) -> int:
+        return len(self.active_sessions)
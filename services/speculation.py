@@ -0,0 +1,175 @@
+import asyncio
+import time
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from providers.llm.base import BaseLLMProvider
+from services.segmenter import SentenceSegmenter
+from services.speech_stream import SegmentAudio
+from utils.text import normalize_text
+
+
+def messages_key(messages: List[Dict[str, str]]) -> Tuple[Tuple[str, str], ...]:
+    return tuple((m["role"], normalize_text(m["content"])) for m in messages)
+
+
+class SpeculativeRun:
+    """Background LLM generation for one transcript hypothesis, replayable once committed"""
+
+    def __init__(
+        self,
+        messages: List[Dict[str, str]],
+        tokens: AsyncIterator[str],
+        segmenter: Optional[SentenceSegmenter] = None,
+        prefetch: Optional[Callable[[str], SegmentAudio]] = None
+    ):
+        self.messages = messages
+        self.key = messages_key(messages)
+        self.tokens: List[str] = []
+        self.finished = False
+        self.error: Optional[Exception] = None
+        self.first_segment: Optional[SegmentAudio] = None
+        self.started_at = time.monotonic()
+        self._segmenter = segmenter if prefetch else None
+        self._prefetch = prefetch
+        self._updated = asyncio.Event()
+        self.task = asyncio.create_task(self._consume(tokens))
+
+    async def _consume(self, tokens: AsyncIterator[str]):
+        try:
+            async for token in tokens:
+                self.tokens.append(token)
+                self._updated.set()
+                if self._segmenter and not self.first_segment:
+                    segments = self._segmenter.push(token)
+                    if segments:
+                        self.first_segment = self._prefetch(segments[0])
+            if self._segmenter and not self.first_segment:
+                segments = self._segmenter.flush()
+                if segments:
+                    self.first_segment = self._prefetch(segments[0])
+        except Exception as e:
+            self.error = e
+        finally:
+            self.finished = True
+            self._updated.set()
+
+    async def replay(self) -> AsyncIterator[str]:
+        i = 0
+        while True:
+            while i < len(self.tokens):
+                yield self.tokens[i]
+                i += 1
+            if self.finished:
+                if self.error:
+                    raise self.error
+                return
+            self._updated.clear()
+            await self._updated.wait()
+
+    def cancel(self):
+        self.task.cancel()
+        if self.first_segment and self.first_segment.task:
+            self.first_segment.task.cancel()
+
+
+async def cancel_on_close(segments: AsyncIterator, run: SpeculativeRun) -> AsyncIterator:
+    """Pass a committed run's reply through, stopping the run if the reply ends first (barge-in, hang-up)"""
+    try:
+        async for segment in segments:
+            yield segment
+    finally:
+        try:
+            await segments.aclose()
+        finally:
+            if not run.finished:
+                run.cancel()
+
+
+class SpeculativeGenerator:
+    """Starts LLM generation once an interim hypothesis holds still, commits it if the final matches"""
+
+    def __init__(
+        self,
+        llm: BaseLLMProvider,
+        build_messages: Callable[[str], List[Dict[str, str]]],
+        stable_ms: int = 250,
+        segmenter_factory: Optional[Callable[[], SentenceSegmenter]] = None,
+        prefetch: Optional[Callable[[str], SegmentAudio]] = None
+    ):
+        self.llm = llm
+        self.build_messages = build_messages
+        self.stable_ms = stable_ms
+        self.segmenter_factory = segmenter_factory or SentenceSegmenter
+        self.prefetch = prefetch
+        self.hypothesis = ""
+        self.run: Optional[SpeculativeRun] = None
+        self._timer: Optional[asyncio.Task] = None
+
+        self.started = 0
+        self.hits = 0
+        self.misses = 0
+        self.wasted_tokens = 0
+
+    def observe(self, text: str):
+        """Feed the latest interim hypothesis for the whole user turn"""
+        normalized = normalize_text(text)
+        if not normalized or normalized == self.hypothesis:
+            return
+        self.hypothesis = normalized
+        if self._timer:
+            self._timer.cancel()
+        if self.run and self.run.key != messages_key(self.build_messages(text)):
+            self._discard()
+        if not self.run:
+            self._timer = asyncio.create_task(self._start_when_stable(text))
+
+    async def _start_when_stable(self, text: str):
+        await asyncio.sleep(self.stable_ms / 1000)
+        messages = self.build_messages(text)
+        self.started += 1
+        self.run = SpeculativeRun(
+            messages,
+            self.llm.stream_response(messages),
+            segmenter=self.segmenter_factory(),
+            prefetch=self.prefetch
+        )
+
+    def commit(self, final_text: str) -> Optional[SpeculativeRun]:
+        """Hand over the running generation if it was for this transcript, otherwise cancel it"""
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        self.hypothesis = ""
+        run = self.run
+        if run is None:
+            return None
+        if run.key == messages_key(self.build_messages(final_text)):
+            self.hits += 1
+            self.run = None
+            return run
+        self._discard()
+        return None
+
+    def reset(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        self.hypothesis = ""
+        if self.run:
+            self._discard()
+
+    def _discard(self):
+        self.misses += 1
+        self.wasted_tokens += len(self.run.tokens)
+        self.run.cancel()
+        self.run = None
+
+    def stats(self) -> Dict[str, float]:
+        decided = self.hits + self.misses
+        return {
+            'started': self.started,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / decided, 3) if decided else 0.0,
+            'wasted_tokens': self.wasted_tokens
+        }
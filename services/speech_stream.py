@@ -0,0 +1,119 @@
+import asyncio
+import time
+from typing import AsyncIterator, Optional
+
+from pydub import AudioSegment
+
+from providers.tts.base import AudioFormat, BaseTTSProvider
+from services.recorder import SessionRecorder
+from utils.audio import ulaw_to_pcm16
+
+
+class SegmentAudio:
+    """Audio for one reply segment, readable while it is still being synthesized"""
+
+    def __init__(self, text: str, audio_format: AudioFormat):
+        self.text = text
+        self.format = audio_format
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.task: Optional[asyncio.Task] = None
+        self.requested_at = time.monotonic()
+        self.first_audio_at: Optional[float] = None
+
+    async def fill(self, chunks: AsyncIterator[bytes]):
+        try:
+            async for chunk in chunks:
+                if self.first_audio_at is None:
+                    self.first_audio_at = time.monotonic()
+                self.queue.put_nowait(chunk)
+        except Exception as e:
+            self.queue.put_nowait(e)
+        finally:
+            self.queue.put_nowait(None)
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        while True:
+            item = await self.queue.get()
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    async def pcm16(self) -> bytes:
+        """The whole segment as 16-bit PCM, once synthesis finishes"""
+        data = b''.join([chunk async for chunk in self.chunks()])
+        if self.format.encoding == "mulaw":
+            data = ulaw_to_pcm16(data)
+        return data
+
+    async def audio_segment(self) -> AudioSegment:
+        return AudioSegment(
+            data=await self.pcm16(),
+            sample_width=2,
+            frame_rate=self.format.sample_rate,
+            channels=self.format.channels
+        )
+
+
+class SpeechStream:
+    """Synthesizes segments ahead of playback and yields audio strictly in order"""
+
+    def __init__(
+        self,
+        tts_provider: BaseTTSProvider,
+        lookahead: int = 2,
+        audio_format: Optional[AudioFormat] = None,
+        recorder: Optional[SessionRecorder] = None
+    ):
+        self.tts_provider = tts_provider
+        self.lookahead = max(0, lookahead)
+        self.audio_format = audio_format or tts_provider.output_format
+        self.recorder = recorder
+
+    def start_segment(self, text: str) -> SegmentAudio:
+        segment = SegmentAudio(text, self.audio_format)
+        chunks = self.tts_provider.stream_speech(text, self.audio_format)
+        if self.recorder:
+            chunks = self.recorder.tts_stream(text, self.audio_format.name, chunks)
+        segment.task = asyncio.create_task(segment.fill(chunks))
+        return segment
+
+    async def stream(
+        self, segments: AsyncIterator[str], prefetched: Optional[SegmentAudio] = None
+    ) -> AsyncIterator[SegmentAudio]:
+        # One slot for the segment being played plus `lookahead` in flight
+        slots = asyncio.Semaphore(self.lookahead + 1)
+        pending: asyncio.Queue = asyncio.Queue()
+        started = []
+
+        async def produce():
+            try:
+                async for text in segments:
+                    await slots.acquire()
+                    if prefetched and not started and prefetched.text == text:
+                        # Synthesis for the opening segment was already started ahead of time
+                        segment = prefetched
+                    else:
+                        segment = self.start_segment(text)
+                    started.append(segment)
+                    await pending.put(segment)
+            finally:
+                await pending.put(None)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                segment = await pending.get()
+                if segment is None:
+                    break
+                yield segment
+                # The caller has finished with this segment, free its slot
+                slots.release()
+            await producer
+        finally:
+            producer.cancel()
+            for segment in started:
+                segment.task.cancel()
+            if prefetched and prefetched not in started:
+                prefetched.task.cancel()
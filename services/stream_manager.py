@@ -14,6 +14,7 @@ class StreamManager:
         self.lock = asyncio.Lock()
         self.conversation_history: List[Dict[str, str]] = []
         self.current_transcript: str = ""
+        self.unfinalized: str = ""  # latest interim text that no final has covered yet
         self.last_speech_time: float = 0
         self.processing: bool = False
         self.current_tts_task: Optional[asyncio.Task] = None
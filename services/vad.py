@@ -0,0 +1,86 @@
+from collections import deque
+from typing import Deque, List, Optional
+
+import numpy as np
+
+
+class VoiceActivityDetector:
+    """Energy and zero-crossing voice activity detector for 16-bit telephony frames"""
+
+    def __init__(
+        self,
+        threshold_db: float = -45.0,
+        noise_margin_db: float = 10.0,
+        max_zcr: float = 0.35,
+        start_ms: int = 60,
+        end_ms: int = 300,
+        frame_ms: int = 20
+    ):
+        self.threshold_db = threshold_db
+        self.noise_margin_db = noise_margin_db
+        self.max_zcr = max_zcr  # hiss and clicks cross zero far more often than voice
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.frame_ms = frame_ms
+        self.noise_floor_db = threshold_db - noise_margin_db
+        self.in_speech = False
+        self.voiced_ms = 0
+        self.silence_ms = 0
+
+    def is_voiced(self, samples: np.ndarray) -> bool:
+        if samples.size == 0:
+            return False
+        x = samples.astype(np.float32)
+        rms = np.sqrt(np.mean(x * x)) + 1e-9
+        level_db = 20 * np.log10(rms / 32768)
+        zcr = np.count_nonzero(np.diff(np.signbit(x))) / samples.size
+
+        threshold = max(self.threshold_db, self.noise_floor_db + self.noise_margin_db)
+        voiced = level_db > threshold and zcr < self.max_zcr
+        if not voiced and not self.in_speech:
+            # Track the background level slowly so loud lines don't read as speech
+            self.noise_floor_db += 0.05 * (level_db - self.noise_floor_db)
+        return voiced
+
+    def process(self, samples: np.ndarray) -> Optional[str]:
+        """Feed one frame, returns "speech_start", "speech_end" or None"""
+        if self.is_voiced(samples):
+            self.voiced_ms += self.frame_ms
+            self.silence_ms = 0
+            if not self.in_speech and self.voiced_ms >= self.start_ms:
+                self.in_speech = True
+                return "speech_start"
+        else:
+            self.voiced_ms = 0
+            self.silence_ms += self.frame_ms
+            if self.in_speech and self.silence_ms >= self.end_ms:
+                self.in_speech = False
+                return "speech_end"
+        return None
+
+
+class SilenceGate:
+    """Holds back long silences from STT, replaying a short pre-roll when speech resumes"""
+
+    def __init__(self, hold_ms: int = 1000, preroll_ms: int = 200, frame_ms: int = 20):
+        self.hold_ms = hold_ms
+        self.frame_ms = frame_ms
+        self.preroll: Deque[bytes] = deque(maxlen=max(1, preroll_ms // frame_ms))
+        self.suppressing = False
+        self.frames_forwarded = 0
+        self.frames_suppressed = 0
+
+    def filter(self, frame: bytes, vad: VoiceActivityDetector) -> List[bytes]:
+        """Frames to forward to STT now, empty while suppressing"""
+        if vad.in_speech or vad.voiced_ms or vad.silence_ms < self.hold_ms:
+            frames = list(self.preroll) + [frame] if self.suppressing else [frame]
+            self.frames_suppressed -= len(frames) - 1
+            self.preroll.clear()
+            self.suppressing = False
+            self.frames_forwarded += len(frames)
+            return frames
+
+        self.suppressing = True
+        self.preroll.append(frame)
+        self.frames_suppressed += 1
+        return []
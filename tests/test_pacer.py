@@ -0,0 +1,48 @@
+import asyncio
+
+from services.pacer import AudioPacer
+
+
+def test_flush_mid_utterance_is_not_an_underrun():
+    # Ran dry mid-utterance, then a barge-in flush: the silence until the next reply is no underrun
+    async def run():
+        sent = []
+
+        async def send_frame(frame):
+            sent.append(frame)
+
+        pacer = AudioPacer(send_frame, frame_ms=20, lead_ms=60, bytes_per_ms=8)
+        pacer.start()
+        pacer.push(b'\x00' * 160 * 3)
+        await asyncio.sleep(0.1)
+        pacer.flush()
+        await asyncio.sleep(0.3)
+        pacer.push(b'\x00' * 160)
+        pacer.end_utterance()
+        await pacer.drain()
+        await pacer.stop()
+        return pacer.stats()
+
+    stats = asyncio.run(run())
+    assert stats['underruns'] == 0
+    assert stats['underrun_ms'] == 0.0
+
+
+def test_running_dry_mid_utterance_is_an_underrun():
+    async def run():
+        async def send_frame(frame):
+            pass
+
+        pacer = AudioPacer(send_frame, frame_ms=20, lead_ms=60, bytes_per_ms=8)
+        pacer.start()
+        pacer.push(b'\x00' * 160)
+        await asyncio.sleep(0.1)
+        pacer.push(b'\x00' * 160)
+        pacer.end_utterance()
+        await pacer.drain()
+        await pacer.stop()
+        return pacer.stats()
+
+    stats = asyncio.run(run())
+    assert stats['underruns'] == 1
+    assert stats['underrun_ms'] > 50
@@ -0,0 +1,58 @@
+import base64
+
+import numpy as np
+
+# G.711 mu-law constants
+ULAW_BIAS = 0x84
+ULAW_CLIP = 8159  # in 14-bit magnitude
+
+
+def _build_encode_table() -> np.ndarray:
+    # One entry per 16-bit sample, indexed by the sample's unsigned bit pattern.
+    # Follows the reference (and audioop) encoder, which works on 14-bit magnitudes.
+    samples = np.arange(-32768, 32768, dtype=np.int32)
+    value = samples >> 2
+    mask = np.where(value < 0, 0x7F, 0xFF)
+    magnitude = np.minimum(np.minimum(np.abs(value), ULAW_CLIP) + (ULAW_BIAS >> 2), 0x1FFF)
+    segment = np.floor(np.log2(magnitude)).astype(np.int32) - 5
+    ulaw = ((segment << 4) | ((magnitude >> (segment + 1)) & 0x0F)) ^ mask
+    table = np.empty(65536, dtype=np.uint8)
+    table[samples.astype(np.uint16)] = ulaw
+    return table
+
+
+def _build_decode_table() -> np.ndarray:
+    ulaw = ~np.arange(256, dtype=np.int32) & 0xFF
+    exponent = (ulaw >> 4) & 0x07
+    mantissa = ulaw & 0x0F
+    magnitude = (((mantissa << 3) + ULAW_BIAS) << exponent) - ULAW_BIAS
+    return np.where(ulaw & 0x80, -magnitude, magnitude).astype('<i2')
+
+
+_ENCODE_TABLE = _build_encode_table()
+_DECODE_TABLE = _build_decode_table()
+
+
+def pcm16_to_ulaw(data: bytes) -> bytes:
+    """Encode signed 16-bit little-endian PCM to 8-bit mu-law"""
+    samples = np.frombuffer(data, dtype='<u2', count=len(data) // 2)
+    return _ENCODE_TABLE[samples].tobytes()
+
+
+def ulaw_to_pcm16(data: bytes) -> bytes:
+    """Decode 8-bit mu-law to signed 16-bit little-endian PCM"""
+    return _DECODE_TABLE[np.frombuffer(data, dtype=np.uint8)].tobytes()
+
+
+def ulaw_to_samples(data: bytes) -> np.ndarray:
+    """Decode 8-bit mu-law straight to an int16 sample array"""
+    return _DECODE_TABLE[np.frombuffer(data, dtype=np.uint8)]
+
+
+def encode_media_payload(data: bytes) -> str:
+    """Base64 framing for a Twilio media payload"""
+    return base64.b64encode(data).decode('ascii')
+
+
+def decode_media_payload(payload: str) -> bytes:
+    return base64.b64decode(payload)
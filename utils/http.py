@@ -0,0 +1,76 @@
+import asyncio
+import importlib.util
+import logging
+from typing import Dict, Optional, Set
+
+import httpx
+
+from config.base_config import HTTPPoolConfig
+
+logger = logging.getLogger(__name__)
+
+
+class HTTPClientPool:
+    """Process-wide httpx clients, one connection pool per upstream host"""
+
+    def __init__(self, config: Optional[HTTPPoolConfig] = None):
+        self.config = config or HTTPPoolConfig()
+        self.clients: Dict[str, httpx.AsyncClient] = {}
+        self.origins: Set[str] = set()
+
+    def configure(self, config: HTTPPoolConfig):
+        # Takes effect for clients created from here on
+        self.config = config
+
+    def register(self, url: str):
+        """Declare a host that should be warmed up at startup"""
+        self.origins.add(self._origin(url))
+
+    @staticmethod
+    def _origin(url: str) -> str:
+        parsed = httpx.URL(url)
+        return f"{parsed.scheme}://{parsed.netloc.decode()}"
+
+    def client_for(self, url: str) -> httpx.AsyncClient:
+        origin = self._origin(url)
+        client = self.clients.get(origin)
+        if client is None or client.is_closed:
+            client = self._create_client(origin)
+            self.clients[origin] = client
+        return client
+
+    def _create_client(self, origin: str) -> httpx.AsyncClient:
+        config = self.config
+        http2 = config.http2 and importlib.util.find_spec('h2') is not None
+        if config.http2 and not http2:
+            logger.warning("h2 is not installed, falling back to HTTP/1.1")
+        max_connections = config.host_max_connections.get(origin, config.max_connections)
+        return httpx.AsyncClient(
+            base_url=origin,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=min(config.max_keepalive_connections, max_connections),
+                keepalive_expiry=config.keepalive_expiry
+            ),
+            timeout=httpx.Timeout(config.timeout, connect=config.connect_timeout)
+        )
+
+    async def prewarm(self):
+        """Resolve DNS and finish TLS handshakes before the first call needs them"""
+        async def warm(origin: str):
+            try:
+                await self.client_for(origin).head('/')
+            except httpx.HTTPError as e:
+                logger.warning("Error warming %s: %s", origin, e)
+
+        await asyncio.gather(*(warm(origin) for origin in self.origins))
+
+    async def aclose(self):
+        clients = list(self.clients.values())
+        self.clients.clear()
+        for client in clients:
+            await client.aclose()
+
+
+http_pool = HTTPClientPool()
@@ -0,0 +1,151 @@
+import logging
+import os
+import queue
+from collections import defaultdict
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+import orjson
+
+from config.base_config import LoggingConfig
+
+# Set once per call, every task the call spawns inherits it
+session_id_var: ContextVar[Optional[str]] = ContextVar('session_id', default=None)
+
+# Attributes every LogRecord has, anything else came in through extra= and is emitted as a field
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+
+def bind_session(session_id: Optional[str]):
+    session_id_var.set(session_id)
+
+
+def record_fields(record: logging.LogRecord) -> Dict:
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS}
+
+
+class SessionFilter(logging.Filter):
+    """Stamps records with the session of the task that logged them, on the calling thread"""
+
+    def __init__(self):
+        super().__init__()
+        self.worker_id = os.getenv('WORKER_ID')  # set by the multi-worker supervisor
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.session_id = session_id_var.get()
+        if self.worker_id is not None:
+            record.worker_id = self.worker_id
+        return True
+
+
+class LevelSampler(logging.Filter):
+    """Keeps one record in 1/rate per logger and level, for levels that carry high-frequency events"""
+
+    def __init__(self, sample_rates: Dict[str, float]):
+        super().__init__()
+        self.rates = {logging.getLevelName(level.upper()): rate for level, rate in sample_rates.items()}
+        self.counts: Dict[tuple, int] = defaultdict(int)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rates.get(record.levelno)
+        if rate is None or rate >= 1:
+            return True
+        if rate <= 0:
+            return False
+        key = (record.name, record.levelno)
+        count = self.counts[key]
+        self.counts[key] = count + 1
+        if count % max(1, round(1 / rate)):
+            return False
+        record.sample_rate = rate  # lets consumers scale counts back up
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Hands records to the listener thread, dropping them rather than blocking when it falls behind"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only resolve the arguments now, they may change later; formatting happens on the listener thread
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage()
+        }
+        data.update(record_fields(record))
+        if record.exc_info:
+            data['exc'] = self.formatException(record.exc_info)
+        return orjson.dumps(data, default=str).decode()
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines for local development"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = record_fields(record)
+        if fields:
+            line += ' ' + ' '.join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+_handler: Optional[NonBlockingQueueHandler] = None
+_listener: Optional[QueueListener] = None
+
+
+def setup_logging(config: Optional[LoggingConfig] = None):
+    """Route the root logger through a queue drained by a background thread"""
+    global _handler, _listener
+    config = config or LoggingConfig()
+    shutdown_logging()
+
+    output = logging.StreamHandler()
+    output.setFormatter(JsonFormatter() if config.format == "json" else TextFormatter())
+
+    _handler = NonBlockingQueueHandler(queue.Queue(config.queue_size))
+    _handler.addFilter(LevelSampler(config.sample_rates))
+    _handler.addFilter(SessionFilter())
+    _listener = QueueListener(_handler.queue, output)
+    _listener.start()
+
+    root = logging.getLogger()
+    root.handlers = [_handler]
+    root.setLevel(config.level.upper())
+    # httpx logs every request at INFO, one per synthesized segment
+    logging.getLogger('httpx').setLevel(max(root.level, logging.WARNING))
+
+
+def shutdown_logging():
+    """Write out whatever is still queued and stop the listener thread"""
+    global _listener
+    if _listener:
+        _listener.stop()
+        _listener = None
+
+
+def log_stats() -> Dict[str, int]:
+    if _handler is None:
+        return {'queued': 0, 'dropped': 0}
+    return {'queued': _handler.queue.qsize(), 'dropped': _handler.dropped}
@@ -0,0 +1,128 @@
+import asyncio
+import mmap
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+TOUCH_INTERVAL = 60.0  # seconds between mtime updates of an entry that keeps being hit
+
+
+class MmapSegmentStore:
+    """Byte blobs in files read through mmap, shared by every worker on the host
+
+    Put the directory on tmpfs (/dev/shm) and every worker maps the same pages.
+    Opening a map, writes and eviction run in a thread, off the event loop. Entries are
+    evicted by mtime, since atime is unreliable under relatime and mmap; a hit touches
+    it at most once per TOUCH_INTERVAL, which is plenty for ordering evictions.
+    Each worker sizes the directory from its own writes between evictions, so with
+    several workers max_bytes can be overshot until one of them rescans.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, max_open: int = 256):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_open = max_open
+        self.open_maps: "OrderedDict[str, mmap.mmap]" = OrderedDict()
+        self.sizes: Dict[str, int] = {}  # bytes per entry, as of the last scan plus our writes since
+        self.touched: Dict[str, float] = {}  # when we last set each open entry's mtime
+        self.total = 0
+        self.lock = threading.Lock()  # writer threads share the index
+        os.makedirs(directory, exist_ok=True)
+        self._scan()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.seg")
+
+    async def get(self, key: str) -> Optional[memoryview]:
+        mapped = self.open_maps.get(key)
+        if mapped is None:
+            mapped = await asyncio.to_thread(self._open, key)
+            if mapped is None:
+                return None
+            self.open_maps[key] = mapped
+            self.touched[key] = time.monotonic()
+            # Dropped maps close once the last view on them is released
+            while len(self.open_maps) > self.max_open:
+                dropped, _ = self.open_maps.popitem(last=False)
+                self.touched.pop(dropped, None)
+        else:
+            self.open_maps.move_to_end(key)
+            now = time.monotonic()
+            if now - self.touched.get(key, 0.0) >= TOUCH_INTERVAL:
+                self.touched[key] = now
+                await asyncio.to_thread(self._touch, key)
+        return memoryview(mapped)
+
+    def discard(self, key: str):
+        """Forget our map of the entry, the next get maps whatever the file holds by then"""
+        self.open_maps.pop(key, None)
+        self.touched.pop(key, None)
+
+    def _open(self, key: str) -> Optional[mmap.mmap]:
+        try:
+            with open(self._path(key), 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return None
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return None
+        self._touch(key)
+        return mapped
+
+    def _touch(self, key: str):
+        try:
+            os.utime(self._path(key))  # recently used, for eviction in every worker
+        except FileNotFoundError:
+            pass  # evicted, the map stays readable
+
+    async def put(self, key: str, data: bytes):
+        await asyncio.to_thread(self._put, key, data)
+
+    def _put(self, key: str, data: bytes):
+        # Write then rename, so readers in other workers never see a partial segment
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        with self.lock:
+            self.total += len(data) - self.sizes.get(key, 0)
+            self.sizes[key] = len(data)
+            if self.total > self.max_bytes:
+                self._evict()
+
+    def _scan(self) -> list:
+        """Rebuild the index from the directory, returns (mtime, size, key) per entry"""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.seg'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.name[:-4]))
+        self.sizes = {key: size for _, size, key in entries}
+        self.total = sum(self.sizes.values())
+        return entries
+
+    def _evict(self):
+        # The index only says the budget may be exceeded, the rescan sees other workers' entries too
+        entries = self._scan()
+        if self.total <= self.max_bytes:
+            return
+        for _, size, key in sorted(entries):
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            self.total -= size
+            del self.sizes[key]
+            if self.total <= self.max_bytes * 0.9:
+                break
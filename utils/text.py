@@ -0,0 +1,10 @@
+import re
+import string
+
+_PUNCTUATION = str.maketrans('', '', string.punctuation)
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace"""
+    text = text.translate(_PUNCTUATION).lower()
+    return re.sub(r'\s+', ' ', text).strip()